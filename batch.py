@@ -0,0 +1,141 @@
+from abc import ABC, abstractmethod
+import numpy as np
+import rng
+
+class BatchFlows(ABC):
+    # Runs N independent per-RTT flows at once, same model as TCPRenoConnection /
+    # TCPCubicConnection but with every piece of state held in a NumPy array.
+    # rtt, loss_rate and max_packets may be scalars or length-N arrays.
+    # Only the random-loss path is modelled: there is no jitter and no bottleneck
+    # (TCPCCConnection's bandwidth/buffer_size queue), so results match a
+    # TCPCCConnection with jitter=0 and bandwidth=None, not runs with a bottleneck.
+    # Subclasses supply the window rules as _on_ack and _on_loss.
+    def __init__(self, n, rtt=0.15, loss_rate=0.001, max_packets=100, packet_size=1000, seed=None):
+        self.n = n
+        self.rtt = np.broadcast_to(np.asarray(rtt, dtype=float), (n,)).copy()
+        self.loss_rate = np.broadcast_to(np.asarray(loss_rate, dtype=float), (n,)).copy()
+        self.max_packets = np.broadcast_to(np.asarray(max_packets, dtype=np.int64), (n,)).copy()
+        self.packet_size = packet_size
+        # Without a seed the flows get their own stream from the process-wide rng service
+        self.rng = np.random.default_rng(seed) if seed is not None else rng.unique('batch').generator
+        self.cwnd = np.ones(n)
+        self.time = np.zeros(n)
+        self.bytes_sent = np.zeros(n, dtype=np.int64)
+        self.sent_packets = np.zeros(n, dtype=np.int64)
+        self.loss_count = np.zeros(n, dtype=np.int64)
+        self.rounds = np.zeros(n, dtype=np.int64)
+
+    @property
+    def active(self):
+        return self.sent_packets < self.max_packets
+
+    @property
+    def throughput(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.time > 0, self.bytes_sent / self.time, 0.0)
+
+    def step(self):
+        idx = np.flatnonzero(self.active)
+        if idx.size == 0:
+            return 0
+        packets = np.maximum(self.cwnd[idx].astype(np.int64), 1)
+        p = self.loss_rate[idx]
+
+        delivered = self.rng.binomial(packets, 1 - p)
+        self.sent_packets[idx] = np.minimum(self.sent_packets[idx] + delivered, self.max_packets[idx])
+
+        self.time[idx] += self.rtt[idx]
+        self.bytes_sent[idx] += packets * self.packet_size
+        self.rounds[idx] += 1
+
+        # Same order as TCPCCConnection.send_data: on_ack for the round, then on_loss
+        # if any segment of the window was lost
+        self._on_ack(idx, delivered)
+        lost = delivered < packets
+        self.loss_count[idx[lost]] += 1
+        self._on_loss(idx[lost])
+        return idx.size
+
+    def run(self, max_rounds=None):
+        rounds = 0
+        while (max_rounds is None or rounds < max_rounds) and self.step():
+            rounds += 1
+        return self
+
+    def summary(self):
+        return {
+            'time': self.time,
+            'bytes_sent': self.bytes_sent,
+            'throughput': self.throughput,
+            'loss_count': self.loss_count,
+            'rounds': self.rounds,
+            'cwnd': self.cwnd,
+        }
+
+    @abstractmethod
+    def _on_ack(self, idx, acked):
+        # Window growth for flows idx after a round delivering `acked` packets each
+        pass
+
+    @abstractmethod
+    def _on_loss(self, idx):
+        # Window reduction for flows idx that lost a packet this round
+        pass
+
+class BatchReno(BatchFlows):
+    # Vectorized cc.Reno
+    def __init__(self, n, rtt=0.15, loss_rate=0.001, max_packets=100, packet_size=1000, seed=None, ssthresh=64):
+        super().__init__(n, rtt, loss_rate, max_packets, packet_size, seed)
+        self.ssthresh = np.full(n, float(ssthresh))
+
+    def _on_ack(self, idx, acked):
+        cwnd = self.cwnd[idx]
+        # Slow start below ssthresh, congestion avoidance above
+        self.cwnd[idx] = np.where(cwnd < self.ssthresh[idx], cwnd + acked, cwnd + acked / cwnd)
+
+    def _on_loss(self, idx):
+        self.ssthresh[idx] = np.maximum(self.cwnd[idx] / 2, 2)
+        self.cwnd[idx] = self.ssthresh[idx]
+
+class BatchCubic(BatchFlows):
+    # Vectorized cc.Cubic
+    def __init__(self, n, rtt=0.15, loss_rate=0.001, max_packets=100, packet_size=1000, seed=None, beta=0.7, C=0.4, ssthresh=64, fast_convergence=True):
+        super().__init__(n, rtt, loss_rate, max_packets, packet_size, seed)
+        self.beta = beta
+        self.C = C
+        self.fast_convergence = fast_convergence
+        self.ssthresh = np.full(n, float(ssthresh))
+        self.w_max = np.zeros(n)
+        self.k = np.zeros(n)
+        self.origin = np.zeros(n)
+        self.epoch_start = np.full(n, np.nan)  # NaN: no growth epoch yet
+
+    def _on_ack(self, idx, acked):
+        cwnd = self.cwnd[idx]
+        slow = cwnd < self.ssthresh[idx]
+        self.cwnd[idx[slow]] = cwnd[slow] + acked[slow]
+        idx, acked, cwnd = idx[~slow], acked[~slow], cwnd[~slow]
+        now = self.time[idx]
+
+        new = np.isnan(self.epoch_start[idx])
+        fresh = idx[new]
+        self.epoch_start[fresh] = now[new]
+        self.k[fresh] = np.cbrt(np.maximum(self.w_max[fresh] - cwnd[new], 0) / self.C)
+        self.origin[fresh] = np.maximum(self.w_max[fresh], cwnd[new])
+
+        t = now - self.epoch_start[idx]
+        target = np.minimum(self.C * (t - self.k[idx]) ** 3 + self.origin[idx], 1.5 * cwnd)
+        cwnd = np.where(target > cwnd, cwnd + (target - cwnd) / cwnd * acked, cwnd + 0.01 * acked / cwnd)
+        w_est = self.w_max[idx] * self.beta + 3 * (1 - self.beta) / (1 + self.beta) * t / self.rtt[idx]
+        self.cwnd[idx] = np.maximum(cwnd, w_est)
+
+    def _reduce(self, idx):
+        cwnd = self.cwnd[idx]
+        self.epoch_start[idx] = np.nan
+        converge = (cwnd < self.w_max[idx]) if self.fast_convergence else np.zeros(idx.size, dtype=bool)
+        self.w_max[idx] = np.where(converge, cwnd * (1 + self.beta) / 2, cwnd)
+        self.ssthresh[idx] = np.maximum(cwnd * self.beta, 2)
+
+    def _on_loss(self, idx):
+        self._reduce(idx)
+        self.cwnd[idx] = self.ssthresh[idx]
@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import resource
+import subprocess
+import rng
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL = os.path.join(ROOT, 'model')
+if MODEL not in sys.path:
+    sys.path.append(MODEL)
+
+# Headless benchmarks of both engines. Each one returns the work it did:
+#   events: simulator steps (rounds for the per-RTT engine, timer-wheel callbacks for the packet engine)
+#   packets: packets handed to the network
+#   sim_time: virtual seconds simulated
+# `scale` multiplies the size of every workload.
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+def _rtt_flow(cc, scale, loss_rate=0.001, bandwidth=None):
+    from network import TCPConnection, TCPCCConnection
+    conn = TCPCCConnection('bench', cc, rtt=0.05, max_packets=int(2_000_000 * scale), jitter=0.001,
+                           loss_rate=loss_rate, bandwidth=bandwidth)
+    conn.send_data('X' * 1000, TCPConnection('sink'))
+    return {'events': conn.metrics.seen, 'packets': conn.sent_packets, 'sim_time': conn.time}
+
+@benchmark('rtt_reno')
+def bench_rtt_reno(scale):
+    from cc import Reno
+    return _rtt_flow(Reno(), scale)
+
+@benchmark('rtt_cubic')
+def bench_rtt_cubic(scale):
+    from cc import Cubic
+    return _rtt_flow(Cubic(), scale)
+
+@benchmark('rtt_bottleneck')
+def bench_rtt_bottleneck(scale):
+    # Same flow through a finite bottleneck queue, so the drop model runs every round
+    from cc import Reno
+    return _rtt_flow(Reno(), scale, loss_rate=0.0, bandwidth=2000)
+
+@benchmark('batch_reno')
+def bench_batch_reno(scale):
+    from batch import BatchReno
+    flows = 1000
+    sim = BatchReno(flows, rtt=0.05, loss_rate=0.001, max_packets=int(20_000 * scale), seed=0).run()
+    return {'events': int(sim.rounds.sum()), 'packets': int(sim.sent_packets.sum()), 'sim_time': float(sim.time.max())}
+
+def _packet_stats(sim_time, *conns):
+    from frame import get_wheel
+    return {'events': get_wheel().fired, 'packets': sum(c.sent_packets for c in conns), 'sim_time': sim_time}
+
+@benchmark('sliding_window_loss')
+def bench_sliding_window_loss(scale):
+    # One sliding-window sender on a lossy access link, until every segment is acknowledged
+    from frame import SlidingWindowTCPConnection, TCPConnection, TCPPacket, Router, run, now
+    n = int(20_000 * scale)
+    mss = 1000
+    result = {}
+
+    async def main():
+        router = Router(send_interval=0.0001, max_buffer_size=1000)
+        sender = SlidingWindowTCPConnection('sender', router, rtt=0.01, max_packets=10 ** 12, loss_rate=0.01, window_size=32)
+        receiver = TCPConnection('receiver', router, rtt=0.01, max_packets=10 ** 12, loss_rate=0.0)
+        receiver.verbose = False
+        receiver.rcv_started = True
+        payload = memoryview(b'X' * mss)
+        await sender.send_stream((TCPPacket.segment(payload, 0, mss, seq=i * mss) for i in range(n)), receiver)
+        while receiver.ack < n * mss:
+            await asyncio.sleep(0.1)
+        result.update(_packet_stats(now(), sender, receiver))
+
+    run(main())
+    return result
+
+@benchmark('router_overflow')
+def bench_router_overflow(scale):
+    # A sender offering 10x the link rate into a 50-packet tail-drop buffer
+    from frame import TCPConnection, TCPPacket, Router, run, now
+    bursts = int(2_000 * scale)
+    result = {}
+
+    async def main():
+        router = Router(send_interval=0.001, max_buffer_size=50)
+        sender = TCPConnection('sender', router, rtt=0.005, max_packets=10 ** 12, jitter=0.0, loss_rate=0.0)
+        receiver = TCPConnection('receiver', router, rtt=0.005, max_packets=10 ** 12, jitter=0.0, loss_rate=0.0)
+        receiver.verbose = False
+        receiver.rcv_started = True
+        seq = 0
+        for _ in range(bursts):
+            for _ in range(10):
+                await sender.send(TCPPacket(seq=seq, data='X' * 100), receiver)
+                seq += 100
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(1)
+        result.update(_packet_stats(now(), sender, receiver))
+
+    run(main())
+    return result
+
+@benchmark('bottleneck_flows')
+def bench_bottleneck_flows(scale):
+    # Reno, CUBIC and BBR flows sharing one bottleneck
+    from frame import run, now
+    from scenario import Scenario
+    scenario = Scenario(bandwidth=1.25e6, delay=0.01, buffer_size=100)
+    for i in range(8):
+        scenario.add_flow(('reno', 'cubic', 'bbr')[i % 3], rtt=0.04 + 0.01 * i)
+    scenario.duration = 10.0 * scale
+    result = {}
+
+    async def main():
+        # Scenario.run without leaving the loop, so the wheel can still be read
+        await scenario._main(scenario.duration)
+        result.update(_packet_stats(now(), *(c for f in scenario.flows for c in (f.sender, f.receiver))))
+
+    run(main())
+    return result
+
+def _peak_rss():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss * 1024 if sys.platform != 'darwin' else rss
+
+def run_benchmark(name, scale=1.0, seed=0):
+    # Runs one benchmark in the current process
+    rng.seed(seed)
+    start = time.perf_counter()
+    work = BENCHMARKS[name](scale)
+    wall = time.perf_counter() - start
+    return {
+        'wall': wall,
+        'events': work['events'],
+        'packets': work['packets'],
+        'sim_time': work['sim_time'],
+        'events_per_sec': work['events'] / wall,
+        'packets_per_sec': work['packets'] / wall,
+        'sim_per_wall': work['sim_time'] / wall,
+        'peak_rss': _peak_rss(),
+    }
+
+def run_all(names=None, scale=1.0, repeat=3):
+    # Every repetition runs in a fresh interpreter so peak RSS belongs to that benchmark alone.
+    # The fastest repetition is kept.
+    names = names or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        best = None
+        for _ in range(repeat):
+            with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(run_benchmark, name, scale).result()
+            if best is None or result['wall'] < best['wall']:
+                best = result
+        results[name] = best
+    return results
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def report(results, scale, repeat):
+    return {
+        'commit': _git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': scale,
+        'repeat': repeat,
+        'benchmarks': results,
+    }
+
+# Rates where higher is better; peak_rss is compared the other way round
+RATES = ('events_per_sec', 'packets_per_sec', 'sim_per_wall')
+
+def check_comparable(old, scale, repeat):
+    # Rates change with workload size and best-of-N with N, so only like-for-like runs compare
+    if old.get('scale') != scale or old.get('repeat') != repeat:
+        raise ValueError(f"Baseline ran with scale={old.get('scale')}, repeat={old.get('repeat')}; "
+                         f"this run uses scale={scale}, repeat={repeat}")
+
+def compare(old, new, threshold=0.1):
+    # Returns (name, metric, old, new, change) for every metric that got worse by more than `threshold`
+    check_comparable(old, new['scale'], new['repeat'])
+    regressions = []
+    for name, after in new['benchmarks'].items():
+        before = old['benchmarks'].get(name)
+        if before is None:
+            continue
+        for metric in RATES:
+            if before[metric] and after[metric] < before[metric] * (1 - threshold):
+                regressions.append((name, metric, before[metric], after[metric], after[metric] / before[metric] - 1))
+        if after['peak_rss'] > before['peak_rss'] * (1 + threshold):
+            regressions.append((name, 'peak_rss', before['peak_rss'], after['peak_rss'], after['peak_rss'] / before['peak_rss'] - 1))
+    return regressions
+
+def _print_table(data, baseline=None):
+    print(f"{'benchmark':<22}{'wall s':>9}{'events/s':>12}{'packets/s':>12}{'sim/wall':>10}{'RSS MiB':>9}{'vs base':>9}")
+    for name, r in data['benchmarks'].items():
+        change = ''
+        if baseline and name in baseline['benchmarks']:
+            change = f"{r['events_per_sec'] / baseline['benchmarks'][name]['events_per_sec'] - 1:+.1%}"
+        print(f"{name:<22}{r['wall']:>9.3f}{r['events_per_sec']:>12.0f}{r['packets_per_sec']:>12.0f}"
+              f"{r['sim_per_wall']:>10.1f}{r['peak_rss'] / 2 ** 20:>9.1f}{change:>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the simulator benchmarks and compare against a saved baseline.')
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--scale', type=float, default=1.0, help='workload size multiplier')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default=None, help='write results to this JSON file')
+    parser.add_argument('--compare', default=None, metavar='BASELINE', help='JSON file from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown counted as a regression')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        try:
+            check_comparable(baseline, args.scale, args.repeat)
+        except ValueError as exc:
+            parser.error(str(exc))
+    data = report(run_all(args.names, args.scale, args.repeat), args.scale, args.repeat)
+    _print_table(data, baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(data, f, indent=2)
+    if baseline:
+        regressions = compare(baseline, data, args.threshold)
+        for name, metric, before, after, change in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.4g} -> {after:.4g} ({change:+.1%})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
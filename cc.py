@@ -0,0 +1,298 @@
+import math
+from collections import deque
+import rng
+
+class CongestionControl:
+    # Congestion-control plug-in shared by the per-RTT engine (network.TCPCCConnection,
+    # batch.py) and the packet-level engine (model/frame.CongestionControlTCPConnection).
+    # Units are packets and seconds. on_ack gets the number of newly delivered packets:
+    # once per ACK in the packet-level engine, once per round in the per-RTT engine.
+    # ignore_random_loss: the packet-level host skips on_loss when its path-state
+    # estimator (model/pathstate.py) has seen repeated loss with little queueing delay
+    # and the queue was not near its recent peak at the time of this loss.
+    ignore_random_loss = False
+
+    def __init__(self, cwnd=1.0):
+        self.cwnd = cwnd
+        self.pacing_rate = None  # packets/s; None sends as fast as cwnd allows
+
+    def on_ack(self, acked, now, rtt=None, inflight=0, rate=0.0, round_start=True):
+        pass
+
+    def on_loss(self, now):
+        # Loss detected by duplicate ACKs, at most once per window
+        pass
+
+    def on_rto(self, now):
+        self.cwnd = 1
+
+class Reno(CongestionControl):
+    def __init__(self, ssthresh=64):
+        super().__init__()
+        self.ssthresh = ssthresh
+
+    def on_ack(self, acked, now, rtt=None, inflight=0, rate=0.0, round_start=True):
+        if self.cwnd < self.ssthresh:
+            # Slow start: one packet per packet acked
+            self.cwnd += acked
+        else:
+            # Congestion avoidance: one packet per window acked
+            self.cwnd += acked / self.cwnd
+
+    def on_loss(self, now):
+        self.ssthresh = max(self.cwnd / 2, 2)
+        self.cwnd = self.ssthresh
+
+    def on_rto(self, now):
+        self.ssthresh = max(self.cwnd / 2, 2)
+        self.cwnd = 1
+
+class Cubic(CongestionControl):
+    # RFC 8312: W(t) = C(t-K)^3 + W_max, with fast convergence and the TCP-friendly region
+    def __init__(self, C=0.4, beta=0.7, ssthresh=64, fast_convergence=True):
+        super().__init__()
+        self.C = C
+        self.beta = beta
+        self.ssthresh = ssthresh
+        self.fast_convergence = fast_convergence
+        self.w_max = 0.0  # Window size before the last reduction
+        self.k = 0.0  # Time for W(t) to climb back to w_max
+        self.origin = 0.0
+        self.epoch_start = None  # Start of the current growth epoch
+        self.rtt = None
+
+    def on_ack(self, acked, now, rtt=None, inflight=0, rate=0.0, round_start=True):
+        if rtt:
+            self.rtt = rtt
+        if self.cwnd < self.ssthresh:
+            self.cwnd += acked
+            return
+        if self.epoch_start is None:
+            self.epoch_start = now
+            self.k = (max(self.w_max - self.cwnd, 0) / self.C) ** (1 / 3)
+            self.origin = max(self.w_max, self.cwnd)
+        t = now - self.epoch_start
+        target = min(self.C * (t - self.k) ** 3 + self.origin, 1.5 * self.cwnd)
+        if target > self.cwnd:
+            self.cwnd += (target - self.cwnd) / self.cwnd * acked
+        else:
+            self.cwnd += 0.01 * acked / self.cwnd
+        if self.rtt:
+            # Never grow slower than Reno would with the same beta
+            w_est = self.w_max * self.beta + 3 * (1 - self.beta) / (1 + self.beta) * t / self.rtt
+            if w_est > self.cwnd:
+                self.cwnd = w_est
+
+    def _reduce(self):
+        self.epoch_start = None
+        if self.fast_convergence and self.cwnd < self.w_max:
+            self.w_max = self.cwnd * (1 + self.beta) / 2
+        else:
+            self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.beta, 2)
+
+    def on_loss(self, now):
+        self._reduce()
+        self.cwnd = self.ssthresh
+
+    def on_rto(self, now):
+        self._reduce()
+        self.cwnd = 1
+
+class WindowedFilter:
+    # Running max over the last `window` rounds.
+    # Monotonic deque of (stamp, value): O(1) amortized per update.
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()
+
+    def update(self, value, stamp):
+        samples = self.samples
+        while samples and samples[-1][1] <= value:
+            samples.pop()
+        samples.append((stamp, value))
+        self.expire(stamp)
+
+    def expire(self, stamp):
+        samples = self.samples
+        while len(samples) > 1 and samples[0][0] <= stamp - self.window:
+            samples.popleft()
+
+    def get(self, default=None):
+        return self.samples[0][1] if self.samples else default
+
+class BBR(CongestionControl):
+    # BBR v1: windowed max delivery rate and min RTT drive pacing_rate and cwnd
+    # through STARTUP / DRAIN / PROBE_BW / PROBE_RTT. Losses do not reduce the rate.
+    STARTUP, DRAIN, PROBE_BW, PROBE_RTT = 'STARTUP', 'DRAIN', 'PROBE_BW', 'PROBE_RTT'
+    HIGH_GAIN = 2 / math.log(2)
+    PACING_GAINS = (1.25, 0.75, 1, 1, 1, 1, 1, 1)
+
+    def __init__(self, initial_cwnd=10, min_cwnd=4, initial_rtt=0.001, bw_window=10, rtt_window=10.0, probe_rtt_time=0.2,
+                 name=None):
+        # name: the owning connection's name, which keys the random-number stream
+        super().__init__(initial_cwnd)
+        self.min_cwnd = min_cwnd
+        self.initial_rtt = initial_rtt
+        self.btl_bw = WindowedFilter(bw_window)  # max delivery rate, keyed by round count
+        self.rt_prop = None  # min RTT, held until matched or expired after rtt_window
+        self.rt_prop_stamp = 0.0
+        self.rtt_window = rtt_window
+        self.probe_rtt_time = probe_rtt_time
+        self.round_count = 0
+        self.delivered = 0
+        self.lost = 0  # losses reported since the last ACK
+        self.full_bw = 0.0
+        self.full_bw_count = 0
+        self.filled_pipe = False
+        self.cycle_index = 0
+        self.cycle_stamp = 0.0
+        self.probe_rtt_done = None
+        self.probe_rtt_round = None
+        self.prior_cwnd = initial_cwnd
+        self.rng = rng.unique('bbr' if name is None else f"bbr/{name}")  # random PROBE_BW phase
+        self._enter(self.STARTUP, 0.0)
+        self.pacing_rate = self.pacing_gain * initial_cwnd / initial_rtt
+
+    @property
+    def bw(self):
+        return self.btl_bw.get(0.0)
+
+    @property
+    def min_rtt(self):
+        return self.initial_rtt if self.rt_prop is None else self.rt_prop
+
+    def bdp(self, gain=1.0):
+        if not self.btl_bw.samples:
+            return self.cwnd
+        return gain * self.bw * self.min_rtt
+
+    def _enter(self, state, now):
+        self.state = state
+        if state == self.STARTUP:
+            self.pacing_gain = self.cwnd_gain = self.HIGH_GAIN
+        elif state == self.DRAIN:
+            self.pacing_gain = 1 / self.HIGH_GAIN
+            self.cwnd_gain = self.HIGH_GAIN
+        elif state == self.PROBE_BW:
+            # Start at a random phase other than the draining one
+            self.cycle_index = self.rng.choice([i for i in range(len(self.PACING_GAINS)) if i != 1])
+            self.cycle_stamp = now
+            self.pacing_gain = self.PACING_GAINS[self.cycle_index]
+            self.cwnd_gain = 2
+        else:
+            self.pacing_gain = self.cwnd_gain = 1
+            self.prior_cwnd = max(self.prior_cwnd, self.cwnd)
+            self.probe_rtt_done = None
+
+    def on_ack(self, acked, now, rtt=None, inflight=0, rate=0.0, round_start=True):
+        # rate: delivery-rate sample (packets/s) carried by this ACK
+        self.delivered += acked
+        if round_start:
+            self.round_count += 1
+        if rate > 0:
+            self.btl_bw.update(rate, self.round_count)
+        self.btl_bw.expire(self.round_count)
+        expired = self.rt_prop is not None and now - self.rt_prop_stamp > self.rtt_window
+        if rtt is not None and rtt > 0 and (self.rt_prop is None or rtt <= self.rt_prop or expired):
+            self.rt_prop = rtt
+            self.rt_prop_stamp = now
+
+        if round_start and not self.filled_pipe:
+            self._check_full_pipe()
+        if self.state == self.STARTUP and self.filled_pipe:
+            self._enter(self.DRAIN, now)
+        if self.state == self.DRAIN and inflight <= self.bdp():
+            self._enter(self.PROBE_BW, now)
+        if self.state == self.PROBE_BW:
+            self._update_cycle(now, inflight)
+        self._update_probe_rtt(now, inflight, expired)
+        self.lost = 0
+
+        self._set_pacing_rate()
+        self._set_cwnd(acked)
+
+    def on_loss(self, now):
+        self.lost += 1
+
+    def on_rto(self, now):
+        # Keep one packet in flight, then grow back with what gets delivered
+        self.prior_cwnd = max(self.prior_cwnd, self.cwnd)
+        self.cwnd = 1
+
+    def _check_full_pipe(self):
+        # Pipe is full once the bandwidth estimate stops growing by 25% for 3 rounds
+        if self.bw >= self.full_bw * 1.25:
+            self.full_bw = self.bw
+            self.full_bw_count = 0
+            return
+        self.full_bw_count += 1
+        if self.full_bw_count >= 3:
+            self.filled_pipe = True
+
+    def _update_cycle(self, now, inflight):
+        next_phase = now - self.cycle_stamp > self.min_rtt
+        if self.pacing_gain > 1:
+            next_phase = next_phase and (self.lost > 0 or inflight >= self.bdp(self.pacing_gain))
+        elif self.pacing_gain < 1:
+            next_phase = next_phase or inflight <= self.bdp()
+        if next_phase:
+            self.cycle_index = (self.cycle_index + 1) % len(self.PACING_GAINS)
+            self.cycle_stamp = now
+            self.pacing_gain = self.PACING_GAINS[self.cycle_index]
+
+    def _update_probe_rtt(self, now, inflight, expired):
+        if self.state != self.PROBE_RTT:
+            if expired:
+                self._enter(self.PROBE_RTT, now)
+            return
+        # Hold cwnd at min_cwnd for probe_rtt_time and at least one round
+        if self.probe_rtt_done is None:
+            if inflight <= self.min_cwnd:
+                self.probe_rtt_done = now + self.probe_rtt_time
+                self.probe_rtt_round = self.round_count + 1
+            return
+        if now >= self.probe_rtt_done and self.round_count >= self.probe_rtt_round:
+            self.rt_prop_stamp = now
+            self.cwnd = max(self.cwnd, self.prior_cwnd)
+            self._enter(self.PROBE_BW if self.filled_pipe else self.STARTUP, now)
+
+    def _set_pacing_rate(self):
+        rate = self.pacing_gain * self.bw
+        if self.filled_pipe or rate > self.pacing_rate:
+            self.pacing_rate = rate
+
+    def _set_cwnd(self, acked):
+        target = self.bdp(self.cwnd_gain) + 3
+        if self.filled_pipe:
+            self.cwnd = min(self.cwnd + acked, target)
+        elif self.cwnd < target or self.delivered < 10:
+            self.cwnd += acked
+        self.cwnd = max(self.cwnd, self.min_cwnd)
+        if self.state == self.PROBE_RTT:
+            self.cwnd = min(self.cwnd, self.min_cwnd)
+
+# Algorithms by name, for hosts that take a string
+ALGORITHMS = {
+    'reno': Reno,
+    'cubic': Cubic,
+    'bbr': BBR,
+}
+
+def switch(cc, algorithm, **kwargs):
+    # A controller of another algorithm that carries on from cc's window: cwnd and, where
+    # both have one, ssthresh. CUBIC starts a new epoch with the current window as W_max;
+    # BBR starts up from the current window.
+    cls = ALGORITHMS[algorithm] if isinstance(algorithm, str) else algorithm
+    new = cls(**kwargs)
+    new.cwnd = cc.cwnd
+    if hasattr(new, 'ssthresh'):
+        new.ssthresh = getattr(cc, 'ssthresh', new.ssthresh)
+    if isinstance(new, Cubic):
+        new.w_max = cc.cwnd
+    if isinstance(new, BBR):
+        new.pacing_rate = new.pacing_gain * new.cwnd / new.min_rtt
+    if 'ignore_random_loss' in vars(cc):
+        # A per-flow setting (Scenario.add_flow) outlives the algorithm change
+        new.ignore_random_loss = cc.ignore_random_loss
+    return new
@@ -0,0 +1,173 @@
+import os
+import sys
+import argparse
+import numpy as np
+from batch import BatchReno, BatchCubic
+from metrics import MetricsRecorder
+import rng
+
+# Window rules by name; any batch.BatchFlows subclass can be passed instead
+ALGORITHMS = {
+    'reno': BatchReno,
+    'cubic': BatchCubic,
+}
+
+class FluidBottleneck:
+    # Mean-field model of many flows sharing one bottleneck, stepped every dt seconds.
+    # Each flow sends at cwnd / (rtt + q/C); the queue integrates dq/dt = Σx - C and is
+    # clipped to [0, buffer_size]. Overflow drops and the link's output are shared in
+    # proportion to rate. A flow sees a loss event with probability 1 - (1 - p)^sent per
+    # step, at most once per RTT (one reduction per window, as with NewReno recovery).
+    # Window growth and reduction are the vectorised cc rules from batch.py, fed with the
+    # fractional number of packets acknowledged in each step.
+    #   capacity: bottleneck rate in packets/s; buffer_size in packets
+    def __init__(self, capacity, buffer_size=100, dt=None, packet_size=1000, seed=None, record_interval=0.01):
+        self.capacity = capacity
+        self.buffer_size = buffer_size
+        self.dt = dt
+        self.packet_size = packet_size
+        self.rng = np.random.default_rng(seed) if seed is not None else rng.unique('fluid').generator
+        self.groups = []  # (name, batch rules, last loss time per flow, delivered per flow)
+        self.queue = 0.0
+        self.time = 0.0
+        self.dropped = 0.0
+        self.metrics = MetricsRecorder(('time', 'queue', 'rate', 'drop_rate'), interval=record_interval)
+
+    def add_flows(self, algorithm='reno', n=1, rtt=0.05, loss_rate=0.0, name=None, **kwargs):
+        # rtt: round-trip time without queueing; loss_rate: random (non-congestion) loss.
+        # kwargs go to the batch class, e.g. ssthresh, beta, C.
+        cls = ALGORITHMS[algorithm] if isinstance(algorithm, str) else algorithm
+        name = name or f"{getattr(cls, '__name__', algorithm)}-{len(self.groups)}"
+        flows = cls(n, rtt=rtt, loss_rate=loss_rate, packet_size=self.packet_size, **kwargs)
+        self.groups.append((name, flows, np.full(n, -np.inf), np.zeros(n)))
+        return flows
+
+    def step(self, dt):
+        C = self.capacity
+        rates = [flows.cwnd / (flows.rtt + self.queue / C) for _, flows, _, _ in self.groups]
+        total = sum(float(x.sum()) for x in rates)
+
+        # Queue: integrate the excess arrival rate, drop what does not fit
+        arrived = total * dt
+        queue = self.queue + arrived - C * dt
+        dropped = 0.0
+        if queue > self.buffer_size:
+            dropped = queue - self.buffer_size
+            queue = self.buffer_size
+        queue = max(queue, 0.0)
+        served = self.queue + arrived - dropped - queue
+        drop = dropped / arrived if arrived else 0.0
+        share = served / arrived if arrived else 0.0
+        self.dropped += dropped
+        self.queue = queue
+        self.time += dt
+
+        for (_, flows, last_loss, delivered), x in zip(self.groups, rates):
+            sent = x * dt
+            p = 1 - (1 - drop) * (1 - flows.loss_rate)
+            acked = sent * share * (1 - flows.loss_rate)
+            delivered += acked
+            flows.time[:] = self.time
+            everyone = np.arange(flows.n)
+            flows._on_ack(everyone, acked)
+
+            rtt = flows.rtt + self.queue / C
+            hit = self.rng.random(flows.n) < -np.expm1(sent * np.log1p(-np.minimum(p, 1 - 1e-12)))
+            hit &= self.time - last_loss >= rtt
+            idx = np.flatnonzero(hit)
+            if idx.size:
+                last_loss[idx] = self.time
+                flows.loss_count[idx] += 1
+                flows._on_loss(idx)
+            np.maximum(flows.cwnd, 1.0, out=flows.cwnd)
+
+        self.metrics.record(self.time, self.queue, total, drop)
+
+    def run(self, duration):
+        dt = self.dt or min(float(flows.rtt.min()) for _, flows, _, _ in self.groups) / 20
+        steps = int(round(duration / dt))
+        for _ in range(steps):
+            self.step(dt)
+        return self.results()
+
+    def results(self):
+        elapsed = max(self.time, 1e-9)
+        groups = []
+        goodputs = []
+        for name, flows, _, delivered in self.groups:
+            goodput = delivered * self.packet_size / elapsed
+            goodputs.append(goodput)
+            groups.append({
+                'name': name,
+                'flows': flows.n,
+                'goodput': float(goodput.sum()),
+                'mean_cwnd': float(flows.cwnd.mean()),
+                'loss_events': int(flows.loss_count.sum()),
+            })
+        goodputs = np.concatenate(goodputs) if goodputs else np.zeros(0)
+        queue = self.metrics['queue']
+        return {
+            'groups': groups,
+            'goodput': float(goodputs.sum()),
+            'jain_index': jain_index(goodputs),
+            'utilization': float(goodputs.sum()) / (self.capacity * self.packet_size),  # share of link time
+            'queueing_delay': float(queue.mean()) / self.capacity if len(queue) else 0.0,
+            'dropped': self.dropped,
+        }
+
+def jain_index(values):
+    # (Σx)^2 / (n·Σx^2), 1 means perfectly fair
+    values = np.asarray(values, dtype=float)
+    squares = float((values * values).sum())
+    return float(values.sum()) ** 2 / (len(values) * squares) if squares else 1.0
+
+def cross_check(algorithm='reno', flows=2, bandwidth=1.25e6, delay=0.01, buffer_size=100, rtt=0.05, mss=1000,
+                duration=20.0, seed=0):
+    # Runs the same shared-bottleneck case through model/scenario.Scenario and the fluid
+    # model; returns both summaries. The window rules use the packet engine's ssthresh.
+    model = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
+    if model not in sys.path:
+        sys.path.insert(0, model)
+    from frame import HEADER_SIZE
+    from scenario import Scenario
+    rng.seed(seed)
+    scenario = Scenario(bandwidth=bandwidth, delay=delay, buffer_size=buffer_size, mss=mss)
+    for _ in range(flows):
+        scenario.add_flow(algorithm, rtt=rtt)
+    packet = scenario.run(duration)
+
+    # Goodput counts payload bytes, the link also carries the header
+    fluid = FluidBottleneck(bandwidth / (mss + HEADER_SIZE), buffer_size, packet_size=mss, seed=seed)
+    fluid.add_flows(algorithm, flows, rtt=rtt, ssthresh=16)
+    fluid = fluid.run(duration)
+    return {
+        'packet': {
+            'goodput': sum(f['goodput'] for f in packet['flows']),
+            'jain_index': packet['jain_index'],
+            'utilization': packet['utilization'],
+            'queueing_delay': packet['queue']['mean_sojourn'],
+        },
+        'fluid': {
+            'goodput': fluid['goodput'],
+            'jain_index': fluid['jain_index'],
+            'utilization': fluid['goodput'] / bandwidth,  # same definition as Scenario
+            'queueing_delay': fluid['queueing_delay'],
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the fluid model with the packet-level engine on a small case.')
+    parser.add_argument('--algorithm', choices=sorted(ALGORITHMS), default='reno')
+    parser.add_argument('--flows', type=int, default=2)
+    parser.add_argument('--bandwidth', type=float, default=1.25e6, help='bytes/s')
+    parser.add_argument('--buffer', type=int, default=100)
+    parser.add_argument('--rtt', type=float, default=0.05)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args(argv)
+    result = cross_check(args.algorithm, args.flows, args.bandwidth, buffer_size=args.buffer, rtt=args.rtt,
+                         duration=args.duration)
+    for engine, summary in result.items():
+        print(engine, ' '.join(f"{k}={v:.4g}" for k, v in summary.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import os
+import sys
+import time
+import asyncio
+import inspect
+import argparse
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL = os.path.join(ROOT, 'model')
+if MODEL not in sys.path:
+    sys.path.append(MODEL)
+
+# Opt-in profiling of both engines. Profiler.enable() replaces the handlers listed in
+# TARGETS with counting wrappers and disable() puts the originals back, so an
+# uninstrumented run executes exactly the code it always did.
+#   calls: every call of every handler is counted
+#   time: one in `sample_every` outermost calls per handler is timed together with
+#         every instrumented call nested inside it; totals are scaled back up
+#   gauges: queue depth and pending timers/tasks, read on sampled calls
+# Coroutine handlers are timed per step, so time spent suspended is not charged to them.
+# Results come out as a text summary, a dict, or folded stacks ("a;b;c <us>") for
+# flamegraph.pl, speedscope or inferno.
+
+# module -> classes (None: every class defining instrumented methods) -> methods (None: all)
+TARGETS = {
+    'packet': {'TCPPacket': ('__init__', 'segment')},
+    'network': {'TCPConnection': None, 'TCPCCConnection': None},
+    'cc': None,
+    'timerwheel': {'TimerWheel': ('schedule_at', 'cancel', '_fire')},
+    'queues': None,
+    'frame': {name: None for name in ('TCPConnection', 'TCPConnectionWithTimeout', 'SlidingWindowTCPConnection',
+                                      'CongestionControlTCPConnection', 'Router')},
+}
+# Loops that run for the whole simulation: always timed, never sampled, and transparent,
+# so the handlers they call count as outermost calls
+DRIVERS = {'send_data', 'send_stream'}
+
+def _probe_wheel(wheel, *args):
+    return (('pending_timers', wheel.pending), ('tasks', len(asyncio.all_tasks(wheel.loop))))
+
+def _probe_router(router, *args):
+    return (('queue_depth', len(router.buffer)),)
+
+def _probe_rtt(conn, *args):
+    return (('queue_depth', conn.queue),)
+
+# Gauges read before a sampled call of these handlers
+PROBES = {
+    'timerwheel.TimerWheel._fire': _probe_wheel,
+    'frame.Router.enqueue': _probe_router,
+    'network.TCPCCConnection._transmit': _probe_rtt,
+}
+
+class _Steps:
+    # Awaitable running a coroutine one step at a time, each step timed like a call
+    __slots__ = ('profiler', 'name', 'coro')
+
+    def __init__(self, profiler, name, coro):
+        self.profiler = profiler
+        self.name = name
+        self.coro = coro
+
+    def __await__(self):
+        coro, call = self.coro, self.profiler._call
+        value, error = None, None
+        while True:
+            try:
+                if error is None:
+                    yielded = call(self.name, coro.send, (value,), {})
+                else:
+                    yielded = call(self.name, coro.throw, (error,), {})
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as exc:
+                value, error = None, exc
+
+class Profiler:
+    def __init__(self, sample_every=16, targets=None):
+        self.sample_every = sample_every
+        self.targets = TARGETS if targets is None else targets
+        self.calls = Counter()  # handler -> calls
+        self.sampled = Counter()  # handler -> timed calls
+        self.total_ns = Counter()  # handler -> timed time including nested handlers
+        self.self_ns = Counter()  # handler -> timed time excluding nested handlers
+        self.folded = Counter()  # "outer;...;handler" -> timed self time
+        self.drivers = Counter()  # driver -> wall time, not sampled
+        self.gauges = {}  # name -> [samples, sum, max]
+        self._stack = []  # [name, nested ns] of the timed calls in progress
+        self._depth = 0  # inside an outermost call that is not being timed
+        self._ticks = Counter()  # outermost calls per handler, for the sampling decision
+        self._patches = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    # --- installing the wrappers ---
+
+    def enable(self):
+        if self._patches:
+            return self
+        for module_name, classes in self.targets.items():
+            try:
+                module = __import__(module_name)
+            except ImportError:
+                continue
+            if classes is None:
+                classes = {name: None for name, cls in vars(module).items()
+                           if inspect.isclass(cls) and cls.__module__ == module_name}
+            for class_name, methods in classes.items():
+                self._patch_class(module_name, getattr(module, class_name), methods)
+        return self
+
+    def disable(self):
+        for cls, attr, original in reversed(self._patches):
+            setattr(cls, attr, original)
+        self._patches = []
+
+    def _patch_class(self, module_name, cls, methods):
+        for attr, raw in list(vars(cls).items()):
+            if methods is None:
+                if attr.startswith('__'):
+                    continue
+            elif attr not in methods:
+                continue
+            if isinstance(raw, (classmethod, staticmethod)):
+                wrapped = type(raw)(self._wrap(f"{module_name}.{cls.__name__}.{attr}", raw.__func__))
+            elif inspect.isfunction(raw):
+                wrapped = self._wrap(f"{module_name}.{cls.__name__}.{attr}", raw)
+            else:
+                continue
+            self._patches.append((cls, attr, raw))
+            setattr(cls, attr, wrapped)
+
+    def _wrap(self, name, fn):
+        calls, call = self.calls, self._call
+        if name.rsplit('.', 1)[1] in DRIVERS:
+            return self._wrap_driver(name, fn)
+        if inspect.iscoroutinefunction(fn):
+            async def wrapper(*args, **kwargs):
+                calls[name] += 1
+                return await _Steps(self, name, fn(*args, **kwargs))
+        else:
+            def wrapper(*args, **kwargs):
+                calls[name] += 1
+                return call(name, fn, args, kwargs)
+        wrapper.__wrapped__ = fn
+        wrapper.__name__ = fn.__name__
+        return wrapper
+
+    def _wrap_driver(self, name, fn):
+        calls, drivers = self.calls, self.drivers
+        if inspect.iscoroutinefunction(fn):
+            async def wrapper(*args, **kwargs):
+                calls[name] += 1
+                start = time.perf_counter_ns()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    drivers[name] += time.perf_counter_ns() - start
+        else:
+            def wrapper(*args, **kwargs):
+                calls[name] += 1
+                start = time.perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    drivers[name] += time.perf_counter_ns() - start
+        wrapper.__wrapped__ = fn
+        wrapper.__name__ = fn.__name__
+        return wrapper
+
+    # --- the per-call path ---
+
+    def _call(self, name, fn, args, kwargs):
+        stack = self._stack
+        if not stack:
+            if self._depth:
+                return fn(*args, **kwargs)
+            ticks = self._ticks
+            ticks[name] += 1
+            if ticks[name] % self.sample_every:
+                self._depth = 1
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._depth = 0
+        enter = time.perf_counter_ns()
+        probe = PROBES.get(name)
+        if probe is not None:
+            for gauge, value in probe(*args):
+                self.gauge(gauge, value)
+        frame = [name, 0]
+        stack.append(frame)
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            stack.pop()
+            own = elapsed - frame[1]
+            self.sampled[name] += 1
+            self.total_ns[name] += elapsed
+            self.self_ns[name] += own
+            self.folded[';'.join([f[0] for f in stack] + [name])] += own
+            if stack:
+                # The caller is charged for this call including the bookkeeping around it,
+                # so profiling overhead does not show up as the caller's own time
+                stack[-1][1] += time.perf_counter_ns() - enter
+
+    def gauge(self, name, value):
+        stats = self.gauges.get(name)
+        if stats is None:
+            stats = self.gauges[name] = [0, 0.0, value]
+        stats[0] += 1
+        stats[1] += value
+        if value > stats[2]:
+            stats[2] = value
+
+    # --- results ---
+
+    def stats(self):
+        # Estimated totals are the timed totals scaled by sample_every
+        scale = self.sample_every
+        handlers = {}
+        for name, calls in self.calls.items():
+            if name.rsplit('.', 1)[1] in DRIVERS:
+                continue
+            handlers[name] = {
+                'calls': calls,
+                'sampled': self.sampled[name],
+                'total_ms': self.total_ns[name] * scale / 1e6,
+                'self_ms': self.self_ns[name] * scale / 1e6,
+                'mean_us': self.total_ns[name] / self.sampled[name] / 1e3 if self.sampled[name] else 0.0,
+            }
+        return {
+            'sample_every': scale,
+            'handlers': handlers,
+            'drivers': {name: ns / 1e6 for name, ns in self.drivers.items()},
+            'gauges': {name: {'samples': n, 'mean': total / n, 'max': peak}
+                       for name, (n, total, peak) in self.gauges.items()},
+        }
+
+    def summary(self, limit=25):
+        stats = self.stats()
+        rows = sorted(stats['handlers'].items(), key=lambda item: -item[1]['self_ms'])
+        lines = [f"{'handler':<48} {'calls':>10} {'sampled':>8} {'self ms':>10} {'total ms':>10} {'us/call':>8}"]
+        for name, row in rows[:limit]:
+            lines.append(f"{name:<48} {row['calls']:>10} {row['sampled']:>8} {row['self_ms']:>10.1f} "
+                         f"{row['total_ms']:>10.1f} {row['mean_us']:>8.2f}")
+        for name, ms in stats['drivers'].items():
+            lines.append(f"driver {name}: {ms:.1f} ms wall")
+        for name, gauge in stats['gauges'].items():
+            lines.append(f"{name}: mean {gauge['mean']:.1f}, max {gauge['max']} ({gauge['samples']} samples)")
+        return '\n'.join(lines)
+
+    def write_folded(self, path):
+        # One "outer;inner;handler <microseconds>" line per stack, scaled like stats()
+        with open(path, 'w') as f:
+            for stack, ns in sorted(self.folded.items()):
+                us = round(ns * self.sample_every / 1e3)
+                if us > 0:
+                    f.write(f"{stack} {us}\n")
+
+def profile(fn, *args, sample_every=16, **kwargs):
+    # Runs fn(*args, **kwargs) instrumented; returns (result, profiler)
+    profiler = Profiler(sample_every)
+    with profiler:
+        result = fn(*args, **kwargs)
+    return result, profiler
+
+def main(argv=None):
+    import bench
+    parser = argparse.ArgumentParser(description='Profile benchmarks from bench.py by handler.')
+    parser.add_argument('names', nargs='*', help=f"benchmarks (default: all): {', '.join(bench.BENCHMARKS)}")
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample-every', type=int, default=16)
+    parser.add_argument('--folded', default=None, help='write folded stacks here (name.folded per benchmark)')
+    args = parser.parse_args(argv)
+    import rng
+    for name in args.names or list(bench.BENCHMARKS):
+        rng.seed(args.seed)
+        _, profiler = profile(bench.BENCHMARKS[name], args.scale, sample_every=args.sample_every)
+        print(f"== {name}")
+        print(profiler.summary())
+        if args.folded:
+            path = args.folded if len(args.names) == 1 else f"{os.path.splitext(args.folded)[0]}.{name}.folded"
+            profiler.write_folded(path)
+
+if __name__ == '__main__':
+    main()
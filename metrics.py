@@ -0,0 +1,154 @@
+import os
+import json
+import numpy as np
+from collections import deque
+
+class MetricsRecorder:
+    # Columnar float64 recorder. Samples go into a preallocated chunk; a full chunk is
+    # kept in memory (path=None) or flushed to `path` and reused, so a run with a
+    # path uses constant memory however long it is.
+    #   format: 'npz' (one file per chunk), 'raw' (one appendable float64 file, read
+    #           back with np.memmap) or 'parquet' (needs pyarrow)
+    #   every: keep one sample in `every`; interval: keep at most one sample per
+    #          `interval` of the first column (normally time)
+    FORMATS = ('npz', 'raw', 'parquet')
+
+    def __init__(self, columns, chunk_size=4096, path=None, format='npz', every=1, interval=0.0):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown metrics format: {format}")
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.path = path
+        self.format = format
+        self.every = every
+        self.interval = interval
+        self.count = 0  # samples kept
+        self.seen = 0  # samples offered to record()
+        self._next_time = None
+        self._buf = np.empty((chunk_size, len(self.columns)))
+        self._n = 0
+        self._chunks = []  # full chunks kept in memory when there is no path
+        self._flushed = 0  # chunks written to disk
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, 'columns.json'), 'w') as f:
+                json.dump({'columns': self.columns, 'format': format}, f)
+
+    def __len__(self):
+        return self.count
+
+    def fresh(self, path=None):
+        # An empty recorder with the same columns, chunking, format and decimation,
+        # writing to `path` (None: kept in memory)
+        return MetricsRecorder(self.columns, self.chunk_size, path, self.format, self.every, self.interval)
+
+    def record(self, *values):
+        self.seen += 1
+        if self.every > 1 and (self.seen - 1) % self.every:
+            return
+        if self.interval:
+            if self._next_time is not None and values[0] < self._next_time:
+                return
+            self._next_time = values[0] + self.interval
+        self._buf[self._n] = values
+        self._n += 1
+        self.count += 1
+        if self._n == self.chunk_size:
+            self._spill()
+
+    def __getstate__(self):
+        # Only the filled part of the current chunk is pickled
+        state = dict(self.__dict__)
+        state['_buf'] = self._buf[:self._n].copy()
+        return state
+
+    def __setstate__(self, state):
+        buf = state['_buf']
+        self.__dict__.update(state)
+        self._buf = np.empty((self.chunk_size, len(self.columns)))
+        self._buf[:len(buf)] = buf
+
+    def _spill(self):
+        if self.path is None:
+            self._chunks.append(self._buf)
+            self._buf = np.empty_like(self._buf)
+        else:
+            self._write(self._buf)
+        self._n = 0
+
+    def _write(self, block):
+        name = os.path.join(self.path, f"{self._flushed:06d}")
+        if self.format == 'npz':
+            np.savez(name + '.npz', **{c: block[:, i] for i, c in enumerate(self.columns)})
+        elif self.format == 'raw':
+            with open(os.path.join(self.path, 'data.f64'), 'ab') as f:
+                f.write(np.ascontiguousarray(block).tobytes())
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.table({c: block[:, i] for i, c in enumerate(self.columns)})
+            pq.write_table(table, name + '.parquet')
+        self._flushed += 1
+
+    def flush(self):
+        # Write the partial chunk too; a no-op without a path
+        if self.path is not None and self._n:
+            self._write(self._buf[:self._n])
+            self._n = 0
+
+    def column(self, name):
+        # Everything recorded so far, from disk and memory
+        i = self.columns.index(name)
+        parts = []
+        if self.path is not None and self._flushed:
+            parts.append(load(self.path)[name])
+        parts.extend(chunk[:, i] for chunk in self._chunks)
+        parts.append(self._buf[:self._n, i])
+        return np.concatenate(parts)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+def load(path):
+    # Reads a recorder directory back as {column: array}; 'raw' data is memory-mapped
+    with open(os.path.join(path, 'columns.json')) as f:
+        meta = json.load(f)
+    columns = meta['columns']
+    if meta['format'] == 'raw':
+        raw = os.path.join(path, 'data.f64')
+        if not os.path.exists(raw) or not os.path.getsize(raw):
+            return {c: np.empty(0) for c in columns}
+        data = np.memmap(raw, dtype=np.float64, mode='r').reshape(-1, len(columns))
+        return {c: data[:, i] for i, c in enumerate(columns)}
+    suffix = '.' + meta['format']
+    files = sorted(f for f in os.listdir(path) if f.endswith(suffix))
+    parts = {c: [] for c in columns}
+    for name in files:
+        if suffix == '.npz':
+            with np.load(os.path.join(path, name)) as chunk:
+                for c in columns:
+                    parts[c].append(chunk[c])
+        else:
+            import pyarrow.parquet as pq
+            table = pq.read_table(os.path.join(path, name))
+            for c in columns:
+                parts[c].append(table.column(c).to_numpy())
+    return {c: np.concatenate(parts[c]) if parts[c] else np.empty(0) for c in columns}
+
+class RateMeter:
+    # Throughput over the last `window` seconds instead of since the start.
+    # add(t, amount) books `amount` at time t and returns the current rate.
+    def __init__(self, window=1.0, start=0.0):
+        self.window = window
+        self.start = start
+        self.events = deque()
+        self.total = 0.0
+
+    def add(self, t, amount):
+        self.events.append((t, amount))
+        self.total += amount
+        events = self.events
+        while events[0][0] <= t - self.window:
+            self.total -= events.popleft()[1]
+        span = min(self.window, t - self.start)
+        return self.total / span if span > 0 else 0.0
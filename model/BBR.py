@@ -0,0 +1,6 @@
+from frame import CongestionControlTCPConnection
+from cc import BBR
+
+class BBRTCPConnection(CongestionControlTCPConnection):
+    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1, window_size=5, metrics=None, pacing=True, pacing_burst=1):
+        super().__init__(name, router, rtt, max_packets, jitter, loss_rate, timeout, window_size, cc=BBR(name=name), metrics=metrics, pacing=pacing, pacing_burst=pacing_burst)
@@ -0,0 +1,6 @@
+from frame import CongestionControlTCPConnection
+from cc import Cubic
+
+class CubicTCPConnection(CongestionControlTCPConnection):
+    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1, window_size=5, C=0.4, beta=0.7, metrics=None, pacing=False, pacing_burst=1):
+        super().__init__(name, router, rtt, max_packets, jitter, loss_rate, timeout, window_size, cc=Cubic(C=C, beta=beta, ssthresh=16), metrics=metrics, pacing=pacing, pacing_burst=pacing_burst)
@@ -1,6 +1,6 @@
 
 import asyncio
-from frame import SlidingWindowTCPConnection, Router, TCPPacket
+from frame import SlidingWindowTCPConnection, Router, TCPPacket, run
 
 async def main():
     router = Router(send_interval=0.003, max_buffer_size=100)
@@ -27,10 +27,12 @@ async def main():
         window_size=5
     )
 
-    # 发送数据
+    # 发送数据，序号按字节计算
+    seq = 1
     for i in range(1, 21):
         data = f"Message {i}"
-        packet = TCPPacket(seq=i, ack=0, syn=False, ack_flag=False, fin=False, data=data)
+        packet = TCPPacket(seq=seq, ack=0, syn=False, ack_flag=False, fin=False, data=data)
+        seq += len(data)
         await sender.send(packet, receiver)
         await asyncio.sleep(0.05)  # 模拟应用层发送间隔
 
@@ -38,4 +40,4 @@ async def main():
     await asyncio.sleep(5)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
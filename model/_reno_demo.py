@@ -1,7 +1,7 @@
 import asyncio
-from Reno import RenoTCPConnection, TCPPacket
-from frame import Router
-import matplotlib.pyplot as plt
+from Reno import RenoTCPConnection
+from frame import Router, TCPPacket, run
+from report import plot_series
 
 async def main():
     router = Router(send_interval=0.01, max_buffer_size=50)
@@ -28,24 +28,20 @@ async def main():
         window_size=5
     )
 
-    # 发送数据
+    # 发送数据，序号按字节计算
+    seq = 1
     for i in range(1, 50):
         data = f"Message {i}"
-        packet = TCPPacket(seq=i, ack=0, syn=False, ack_flag=False, fin=False, data=data)
+        packet = TCPPacket(seq=seq, ack=0, syn=False, ack_flag=False, fin=False, data=data)
+        seq += len(data)
         await sender.send(packet, receiver)
-       await asyncio.sleep(0.02)  # 模拟应用层发送间隔
+        await asyncio.sleep(0.02)  # 模拟应用层发送间隔
 
     # 等待所有包传输完成
     await asyncio.sleep(20)
 
     # 绘制cwnd变化图
-    plt.figure(figsize=(10, 6))
-    plt.plot(sender.cwnd_history, marker='o')
-    plt.title('Reno 拥塞窗口 (cwnd) 变化图')
-    plt.xlabel('事件序号')
-    plt.ylabel('拥塞窗口大小 (cwnd)')
-    plt.grid(True)
-    plt.show()
+    plot_series(sender.cwnd_history, title='Reno 拥塞窗口 (cwnd) 变化图', xlabel='事件序号', ylabel='拥塞窗口大小 (cwnd)', marker='o')
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
@@ -1,26 +1,147 @@
-import time
-import random
+import os
+import sys
 import asyncio
-from collections import OrderedDict
-
-class TCPPacket:
-    def __init__(self, seq=0, ack=0, syn=False, ack_flag=False, fin=False, data=''):
-        self.seq = seq
-        self.ack = ack
-        self.syn = syn
-        self.ack_flag = ack_flag
-        self.fin = fin
-        self.data = data
-
-    def __str__(self):
-        flags = []
-        if self.syn: flags.append('SYN')
-        if self.ack_flag: flags.append('ACK')
-        if self.fin: flags.append('FIN')
-        flag_str = '|'.join(flags) if flags else 'NONE'
-        return f"SEQ={self.seq}, ACK={self.ack}, FLAGS={flag_str}, DATA={self.data}"
+import selectors
+from collections import OrderedDict, deque
+
+# 与 network.py 共用上级目录中的公共模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from packet import TCPPacket, payload_text
+import rng
+from queues import TailDropQueue
+from timerwheel import get_wheel
+from rto import RTOEstimator
+from scoreboard import Scoreboard
+from reassembly import ReassemblyQueue
+from pathstate import PathState
+from cc import Reno
+from metrics import MetricsRecorder
+from tracefile import SEND, RETRANSMIT, ENQUEUE, DROP, DELIVER
+
+HEADER_SIZE = 40  # TCP/IP 头部字节数，用于计算链路发送时间
+
+class _VirtualSelector(selectors.DefaultSelector):
+    # 不真正阻塞等待：把需要等待的时间直接加到虚拟时钟上
+    def __init__(self, loop):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("simulation stalled: no scheduled events left")
+        if timeout > 0:
+            # 跳到最早定时器的绝对时刻而不是累加 timeout：时钟没有累积的浮点误差，
+            # 中间多几次唤醒（如并行模式的同步点）也不改变事件的时间戳
+            self._loop.advance_to(self._loop._scheduled[0].when())
+        return super().select(0)
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    # 模拟时钟事件循环：asyncio 的定时器本身就是按时间排序的堆，
+    # 没有就绪任务时直接把时钟跳到最早的定时器，asyncio.sleep/call_later 用法不变
+    def __init__(self, start=0.0):
+        self._virtual_time = start
+        self._failure = None  # 回调里抛出的第一个异常
+        super().__init__(selector=_VirtualSelector(self))
+
+    def call_exception_handler(self, context):
+        # 定时器回调（时间轮、call_later）抛出的异常终止模拟并在 run 处重新抛出，
+        # 而不是打印出来后带着残缺的状态继续跑完
+        if 'handle' in context and 'exception' in context:
+            if self._failure is None:
+                self._failure = context['exception']
+                self.stop()
+            return
+        super().call_exception_handler(context)
+
+    def run_until_complete(self, future):
+        try:
+            return super().run_until_complete(future)
+        except RuntimeError:
+            failure, self._failure = self._failure, None
+            if failure is None:
+                raise
+            raise failure
+
+    def time(self):
+        return self._virtual_time
+
+    def advance(self, dt):
+        self._virtual_time += dt
+
+    def advance_to(self, when):
+        self._virtual_time = max(self._virtual_time, when)
+
+def run(main, virtual_time=True):
+    # 与 asyncio.run 用法相同；virtual_time=True 时使用模拟时钟
+    if not virtual_time:
+        return asyncio.run(main)
+    with asyncio.Runner(loop_factory=VirtualTimeEventLoop) as runner:
+        return runner.run(main)
+
+def now():
+    return asyncio.get_running_loop().time()
+
+def transplant(loop):
+    # fork 出的子进程里接管父进程停下的模拟：新建一个同一时刻的虚拟时钟循环，把旧循环上待执行的回调和
+    # 时间轮搬过去。旧循环的 epoll 实例和自唤醒管道仍与父进程共享，子进程既不能再用也不能关闭它
+    # （注销其中的 fd 会改到父进程）。挂起的 Task 绑定在旧循环上搬不走，有的话报错
+    tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    if tasks:
+        raise RuntimeError(f"Cannot move {len(tasks)} suspended task(s) to a new event loop")
+    new = VirtualTimeEventLoop(start=loop.time())
+    wheel = get_wheel(loop)
+    for handle in list(loop._ready) + sorted(loop._scheduled, key=lambda h: h.when()):
+        if handle.cancelled() or handle is wheel._handle:
+            continue
+        if isinstance(handle, asyncio.TimerHandle):
+            new.call_at(handle.when(), handle._callback, *handle._args, context=handle._context)
+        else:
+            new.call_soon(handle._callback, *handle._args, context=handle._context)
+    wheel.move_to(new)
+    return new
+
+class _Resume:
+    # 接管一个已经在 await 处挂起的协程，交给 Task 继续驱动
+    def __init__(self, coro, yielded):
+        self.coro = coro
+        self.yielded = yielded
+
+    def __await__(self):
+        yielded = self.yielded
+        while True:
+            try:
+                value = yield yielded
+            except BaseException as exc:
+                try:
+                    yielded = self.coro.throw(exc)
+                except StopIteration as stop:
+                    return stop.value
+            else:
+                try:
+                    yielded = self.coro.send(value)
+                except StopIteration as stop:
+                    return stop.value
+
+async def _finish(resume):
+    return await resume
+
+def dispatch(coro):
+    # 在定时器回调里直接运行处理协程；只有真正挂起时才创建 Task
+    try:
+        yielded = coro.send(None)
+    except StopIteration:
+        return None
+    return asyncio.get_running_loop().create_task(_finish(_Resume(coro, yielded)))
 
 class TCPConnection:
+    tracer = None  # 可选的 tracefile.TraceWriter，记录发送/丢包事件
+    verbose = True  # handle() 是否打印收到的数据
+    # 接收端确认策略（RFC 5681 4.2）：乱序、重复或填补空洞的段总是立即确认
+    ack_every = 1  # 每收到几个按序段回一个 ACK，2 即延迟确认
+    delack_timeout = 0.04  # 延迟确认最多等待的时间
+    gro = False  # 同一批（同一次事件循环回调内）到达的按序段合并成一个段再确认
+    sack_blocks = 3  # 每个 ACK 最多携带的 SACK 块数
+
     def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001):
         self.name = name
         self.seq = 0
@@ -32,19 +153,27 @@ class TCPConnection:
         self.jitter = jitter
         self.loss_rate = loss_rate
         self.router = router
+        self.rcv_started = False  # 是否已确定接收起始序号
+        self.out_of_order = ReassemblyQueue()  # 乱序到达的数据区间
+        self._unacked = 0  # 还没确认的按序段数
+        self._gro_pending = False  # 本批按序段是否还没计入 _unacked
+        self._ece = False  # 待确认的段中是否有 CE 标记
+        self._delack_timer = None
+        self.rng = rng.unique('conn/' + str(name))  # 本连接的丢包/抖动随机数流
 
     async def send(self, packet, peer):
         if self.sent_packets >= self.max_packets:
             return
-        if random.random() < self.loss_rate:
-            # print(f"{self.name}: Packet lost;")
+        if self.loss_rate and self.rng.random() < self.loss_rate:
+            if self.tracer is not None:
+                self.tracer.record(DROP, now(), self, packet)
             return
-        # print(f"{self.name} sending;")
+        if self.tracer is not None:
+            self.tracer.record(SEND, now(), self, packet)
         self.sent_packets += 1
-        # 模拟发送延迟
-        await asyncio.sleep(self.rtt + random.uniform(-self.jitter, self.jitter))
-        # 修改为通过Router发送
-        await self.router.forward(packet, self, peer)
+        # 模拟发送延迟：由时间轮在到达时刻把包交给Router，发送方不必等待
+        delay = self.rtt + self.rng.uniform(-self.jitter, self.jitter)
+        get_wheel().schedule(delay, self.router.enqueue, packet, self, peer)
 
     async def receive(self, packet, peer):
         if packet.syn and not packet.ack_flag:
@@ -53,11 +182,12 @@ class TCPConnection:
             await self._handle_synack(packet)
         elif packet.fin:
             await self._handle_fin(packet, peer)
-        elif packet.data:
+        elif packet.length:
             await self._handle_data(packet, peer)
 
     async def _handle_syn(self, packet, peer):
         self.ack = packet.seq + 1
+        self.rcv_started = True
         self.seq = 100
         syn_ack = TCPPacket(seq=self.seq, ack=self.ack, syn=True, ack_flag=True)
         self.state = 'SYN_RECEIVED'
@@ -65,6 +195,7 @@ class TCPConnection:
 
     async def _handle_synack(self, packet):
         self.ack = packet.seq + 1
+        self.rcv_started = True
         self.state = 'ESTABLISHED'
 
     async def _handle_fin(self, packet, peer):
@@ -73,106 +204,452 @@ class TCPConnection:
         await self.send(fin_ack, peer)
 
     async def _handle_data(self, packet, peer):
-        self.ack = packet.seq + len(packet.data)
-        ack_packet = TCPPacket(seq=self.seq, ack=self.ack, ack_flag=True)
+        # 累积确认：ack 只在按序到达时前移，乱序段放进重组队列并以 SACK 块告知发送方
+        end = packet.seq + packet.length
+        if not self.rcv_started:
+            self.ack = packet.seq
+            self.rcv_started = True
+        # 回显路由器打上的 ECN 拥塞标记
+        self._ece = self._ece or packet.ce
         self.handle(packet.data)
+        if packet.seq > self.ack:
+            self.out_of_order.add(packet.seq, end)
+            await self._send_ack(peer)
+        elif end <= self.ack or self.out_of_order:
+            # 重复段，或者（可能）填补了空洞
+            self.ack = self.out_of_order.advance(max(end, self.ack))
+            await self._send_ack(peer)
+        else:
+            self.ack = end
+            if self.gro:
+                if not self._gro_pending:
+                    self._gro_pending = True
+                    asyncio.get_running_loop().call_soon(self._on_gro_flush, peer)
+            else:
+                await self._on_in_order(peer)
+
+    async def _on_in_order(self, peer):
+        self._unacked += 1
+        if self._unacked >= self.ack_every:
+            await self._send_ack(peer)
+        elif self._delack_timer is None:
+            self._delack_timer = get_wheel().schedule(self.delack_timeout, self._on_delack_timer, peer)
+
+    def _on_gro_flush(self, peer):
+        if not self._gro_pending:
+            return  # 这批段已经随别的 ACK 确认过了
+        self._gro_pending = False
+        dispatch(self._on_in_order(peer))
+
+    def _on_delack_timer(self, peer):
+        self._delack_timer = None
+        if self._unacked:
+            dispatch(self._send_ack(peer))
+
+    async def _send_ack(self, peer):
+        self._unacked = 0
+        self._gro_pending = False
+        if self._delack_timer is not None:
+            get_wheel().cancel(self._delack_timer)
+            self._delack_timer = None
+        ack_packet = TCPPacket(seq=self.seq, ack=self.ack, ack_flag=True)
+        ack_packet.sack = self.out_of_order.blocks(self.sack_blocks) or None
+        ack_packet.ece = self._ece
+        self._ece = False
         await self.send(ack_packet, peer)
 
     def handle(self, data):
-        print(f"{self.name} received: {data}")
+        if self.verbose:
+            print(f"{self.name} received: {payload_text(data)}")
 
 class TCPConnectionWithTimeout(TCPConnection):
-    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1):
+    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1, min_rto=0.2):
         super().__init__(name, router, rtt, max_packets, jitter, loss_rate)
-        self.received_acks = set()  # 跟踪已接收的 ACK 序列号
-        self.timeout = timeout
+        self.timeout = timeout  # 初始 RTO
+        self.rto = RTOEstimator(initial=timeout, min_rto=min_rto)
+        self.scoreboard = Scoreboard()  # 已发送未确认的报文段
+        self._rto_timer = None  # 每个连接只有一个重传定时器
+        self._rto_fire_at = None
+        self._rto_deadline = None
+        self._recovery = deque()  # 超时后视为丢失、等待按 ACK 节奏重传的报文段序号
+        self.retransmissions = 0
 
     async def send(self, packet, peer):
         # 调用父类的 send 方法
         await super().send(packet, peer)
-        # 启动超时重传任务
-        asyncio.create_task(self._timeout(packet, peer, self.timeout))
+        # 纯 ACK 不占序号，不需要重传
+        if (packet.length or packet.syn or packet.fin) and packet.seq not in self.scoreboard:
+            self.scoreboard.add(packet, peer, now())
+            if self._rto_deadline is None:
+                self._arm_rto()
 
     async def receive(self, packet, peer):
         # 调用父类的 receive 方法
         await super().receive(packet, peer)
         if packet.ack_flag:
-            self.received_acks.add(packet.ack)
+            self._on_ack(packet.ack, packet.sack)
+
+    async def _retransmit(self, segment):
+        # 绕过子类的窗口逻辑，直接重发
+        segment.sent_at = now()
+        segment.retransmitted = True
+        self.scoreboard.stamp(segment)
+        self.retransmissions += 1
+        if self.tracer is not None:
+            self.tracer.record(RETRANSMIT, segment.sent_at, self, segment.packet)
+        await TCPConnection.send(self, segment.packet, segment.peer)
+
+    def _on_ack(self, ack, sack=None):
+        # 累积确认裁剪记分板，并用未重传过的包的 RTT 更新估计（Karn 算法）
+        t = now()
+        acked = self.scoreboard.ack(ack, t)
+        sacked = self.scoreboard.sack(sack, t) if sack else []
+        # 之前已被 SACK 的报文段在 SACK 时已取过样本，它们的累积确认被前面的空洞推迟了
+        sample = None
+        for segment in acked:
+            if not segment.retransmitted and not segment.sacked:
+                sample = segment
+        for segment in sacked:
+            if not segment.retransmitted:
+                sample = segment
+        if sample is not None:
+            self.rto.sample(t - sample.sent_at)
+        if acked or sacked:
+            self.on_ack(acked, sacked)
+        if not acked:
+            return
+        if sample is None:
+            # 重传包没有可靠的 RTT 样本，但确认了新数据，结束退避（同启用时间戳选项时的行为）
+            self.rto.backoff = 1
+        # 超时恢复阶段：每收到一个 ACK 重传下一个被视为丢失的报文段
+        while self._recovery:
+            segment = self.scoreboard.get(self._recovery.popleft())
+            if segment is not None and not segment.sacked:
+                dispatch(self._retransmit(segment))
+                break
+        if self.scoreboard:
+            self._arm_rto()
+        else:
+            self._rto_deadline = None
+
+    def _arm_rto(self):
+        # 推迟定时器时只记录新的截止时间，到期回调里再补挂，避免反复取消
+        self._rto_deadline = now() + self.rto.rto
+        if self._rto_timer is None or self._rto_deadline < self._rto_fire_at:
+            wheel = get_wheel()
+            if self._rto_timer is not None:
+                wheel.cancel(self._rto_timer)
+            self._rto_timer = wheel.schedule_at(self._rto_deadline, self._on_rto_timer)
+            self._rto_fire_at = self._rto_deadline
+
+    def _on_rto_timer(self):
+        self._rto_timer = None
+        if self._rto_deadline is None or not self.scoreboard:
+            self._rto_deadline = None
+            return
+        wheel = get_wheel()
+        if self._rto_deadline - now() > wheel.tick:
+            self._rto_timer = wheel.schedule_at(self._rto_deadline, self._on_rto_timer)
+            self._rto_fire_at = self._rto_deadline
+            return
+        # 超时：退避并重传最早未确认的报文段，其余未被 SACK 的之后随 ACK 逐个重传
+        self.rto.back_off()
+        segment = self.scoreboard.first()
+        self._recovery = deque(s.seq for s in self.scoreboard if not s.sacked and s is not segment)
+        self.on_timeout()
+        dispatch(self._retransmit(segment))
+        self._arm_rto()
+
+    def on_timeout(self):
+        # 子类可在此处理超时（如拥塞控制）
+        pass
 
-    async def _timeout(self, packet, peer, _timeout=1):
-        await asyncio.sleep(_timeout)  # 设置超时时间
-        if not self.is_ack_received(packet.seq):
-            # 超时未收到 ACK，重传包
-            await self.send(packet, peer)
+    def on_ack(self, acked, sacked):
+        # 子类可在此根据新交付的报文段估计带宽等（acked 中可能含之前已被 SACK 的）
+        pass
 
     def is_ack_received(self, seq):
-        # 检查是否收到对应序列号的 ACK
-        return (seq + 1 in self.received_acks)
+        # 检查序号为 seq 的报文段是否已被累积确认
+        return seq < self.scoreboard.snd_una
 
 class SlidingWindowTCPConnection(TCPConnectionWithTimeout):
-    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1, window_size=5):
+    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1, window_size=5, pacing_rate=None, pacing_burst=1):
         super().__init__(name, router, rtt, max_packets, jitter, loss_rate, timeout)
-        self.window_size = window_size  # 窗口大小
-        self.base = 1  # 窗口起始序号，从1开始
-        self.next_seq = 0  # 下一个发送的序号
+        self.window_size = window_size  # 窗口大小（报文段数）
+        self.base = 1  # 窗口起始序号（最大累积 ACK）
+        self.next_seq = 0  # 已发送的报文段数
         self.buffer = OrderedDict()  # 使用有序字典作为待发送的数据包队列
-        self.sent_packets_dict = {}  # 已发送但未确认的数据包 {seq: packet}
-    
+        self.source = None  # 批量发送时按需取包的迭代器，见 send_stream
+        self.path = PathState()  # 由 ACK 样本在线诊断路径状态
+        # pacing：令牌桶，速率为 pacing_rate（包/秒，None 不限速），桶深 pacing_burst 个包。
+        # 用最早发送时间 next_send_time 表示，桶满时可以连发 pacing_burst 个包
+        self.pacing_rate = pacing_rate
+        self.pacing_burst = pacing_burst
+        self.next_send_time = 0.0
+        self._pacing_timer = None
+
+    def _window(self):
+        return self.window_size
+
+    def _pacing_rate(self):
+        # 子类可按拥塞控制的状态给出速率
+        return self.pacing_rate
+
+    def _paced(self):
+        # 还没到 pacing 允许的发送时间；时间轮按 tick 唤醒，差不到一个 tick 即可发送
+        return self._pacing_rate() is not None and now() <= self.next_send_time - get_wheel().tick
+
+    def _can_send(self):
+        # 在途（未确认且未被 SACK）的报文段数小于窗口，且 pacing 允许
+        return self.scoreboard.in_flight < self._window() and not self._paced()
+
     async def send(self, packet, peer):
-        if self.next_seq < self.base + self.window_size and self.sent_packets_dict.get(packet.seq) is None:
-            # 在窗口范围内且未发送过该包，发送包
+        if not (packet.length or packet.syn or packet.fin):
+            # 纯 ACK 不占窗口，直接发送
             await super().send(packet, peer)
-            self.sent_packets_dict[packet.seq] = packet
-            asyncio.create_task(self._timeout(packet, peer, self.timeout))
-            self.next_seq += 1
-        else:
-            # 窗口已满，将包加入缓冲队列，确保不重复
-            if packet.seq not in self.buffer:
-                self.buffer[packet.seq] = packet
-    
+            return
+        # 先排进缓冲队列（确保不重复），再按窗口和 pacing 从队头发送，
+        # 已经排队的包总在新包之前发出；发不出去时由 _fill_window 挂上 pacing 定时器
+        if packet.seq not in self.buffer and packet.seq not in self.scoreboard:
+            self.buffer[packet.seq] = packet
+        await self._fill_window(peer)
+
+    async def _transmit(self, packet, peer):
+        await super().send(packet, peer)
+        self.next_seq += 1
+        rate = self._pacing_rate()
+        if rate:
+            # 每发出一个数据段消耗一个令牌：最早发送时间推迟 1/rate，
+            # 空闲时最多攒下 pacing_burst 个包的额度
+            credit = (self.pacing_burst - 1) / rate
+            self.next_send_time = max(self.next_send_time, now() - credit) + 1 / rate
+
     async def receive(self, packet, peer):
-        # ...existing code...
+        # ACK 先经 _on_ack -> on_ack 更新记分板和路径状态
         await super().receive(packet, peer)
         if packet.ack_flag:
             if packet.ack > self.base:
                 self.base = packet.ack
-                # 移除已确认的包
-                for seq in list(self.sent_packets_dict):
-                    if seq < self.base:
-                        del self.sent_packets_dict[seq]
-                # 发送缓冲队列中的数据包
-                while self.buffer and self.next_seq < self.base + self.window_size:
-                    _, pkt = self.buffer.popitem(last=False)
-                    await self.send(pkt, peer)
-    
-    # ...existing code...
+            # 已确认的包由记分板裁剪，发送缓冲队列中的数据包
+            await self._fill_window(peer)
+
+    def on_ack(self, acked, sacked):
+        # 交付速率样本取本次新交付的报文段中最晚发送的那个；
+        # 返回 (新交付数, RTT, 交付速率, 该报文段)，没有新交付时返回 None
+        delivered = [s for s in acked if not s.sacked] + sacked
+        if not delivered:
+            return None
+        latest = max(delivered, key=lambda s: s.delivered)
+        t = now()
+        interval = t - latest.delivered_at
+        rate = (self.scoreboard.delivered - latest.delivered) / interval if interval > 0 else 0.0
+        rtt = None if latest.retransmitted else t - latest.sent_at
+        self.path.on_sample(t, rtt, rate)
+        return len(delivered), rtt, rate, latest
+
+    def on_timeout(self):
+        self.path.on_loss(now())
+
+    async def send_stream(self, packets, peer):
+        # 批量发送：窗口有空位时才从迭代器中取下一个包，不必把所有包先放进缓冲队列
+        self.source = iter(packets)
+        await self._fill_window(peer)
+
+    async def _fill_window(self, peer):
+        while self._can_send():
+            if self.buffer:
+                _, pkt = self.buffer.popitem(last=False)
+            else:
+                pkt = next(self.source, None) if self.source is not None else None
+                if pkt is None:
+                    self.source = None
+                    break
+                if pkt.seq in self.scoreboard:
+                    continue
+            await self._transmit(pkt, peer)
+        # 因 pacing 暂停发送时，到时间后由时间轮唤醒继续发送
+        if (self.buffer or self.source is not None) and self._pacing_timer is None and self._paced():
+            self._pacing_timer = get_wheel().schedule_at(self.next_send_time, self._on_pacing_timer, peer)
+
+    def _on_pacing_timer(self, peer):
+        self._pacing_timer = None
+        dispatch(self._fill_window(peer))
+
+class CongestionControlTCPConnection(SlidingWindowTCPConnection):
+    # 由 cc.py 中的拥塞控制算法决定窗口和发送速率；与 network.TCPCCConnection 共用同一套算法
+    # 算法不给 pacing_rate 时，pacing=True 按 cwnd/srtt 的倍数限速（同 Linux：慢启动 2 倍，之后 1.2 倍）
+    PACING_GAIN_SS = 2.0
+    PACING_GAIN_CA = 1.2
+
+    def __init__(self, name, router, rtt=0.005, max_packets=10000, jitter=0.001, loss_rate=0.001, timeout=1, window_size=5, cc=None, metrics=None, pacing=False, pacing_burst=1):
+        super().__init__(name, router, rtt, max_packets, jitter, loss_rate, timeout, window_size, pacing_burst=pacing_burst)
+        self.cc = cc if cc is not None else Reno()
+        self.pacing = pacing
+        self.next_round_delivered = 0  # 交付数达到该值时开始新的一轮
+        self.dup_ack_count = 0  # 重复ACK计数
+        self.last_ack = 0  # 上一个ACK
+        self.recover = 0  # 上次减窗时已发送的最高序号，确认到这里之前不再减窗
+        # 拥塞窗口的变化记录 (时间, cwnd)，可传入落盘或抽样的 MetricsRecorder
+        self.metrics = metrics if metrics is not None else MetricsRecorder(('time', 'cwnd'))
+        try:
+            start = now()
+        except RuntimeError:
+            start = 0.0  # 在事件循环外创建（如运行前搭好场景），从 0 时刻开始
+        self.metrics.record(start, self.cwnd)  # 初始化记录
+
+    @property
+    def cwnd(self):
+        return self.cc.cwnd
+
+    @property
+    def cwnd_history(self):
+        return self.metrics['cwnd']
+
+    def _window(self):
+        # 发送窗口由拥塞窗口决定
+        return int(self.cc.cwnd)
+
+    def _pacing_rate(self):
+        # 速率由拥塞控制算法决定
+        rate = self.cc.pacing_rate
+        if rate is None and self.pacing and self.rto.srtt:
+            slow_start = self.cc.cwnd < getattr(self.cc, 'ssthresh', 0)
+            gain = self.PACING_GAIN_SS if slow_start else self.PACING_GAIN_CA
+            rate = gain * self.cc.cwnd / self.rto.srtt
+        return rate
+
+    def on_ack(self, acked, sacked):
+        sample = super().on_ack(acked, sacked)
+        if sample is None:
+            return None
+        count, rtt, rate, latest = sample
+        t = now()
+        round_start = latest.delivered >= self.next_round_delivered
+        if round_start:
+            self.next_round_delivered = self.scoreboard.delivered
+        self.cc.on_ack(count, t, rtt, self.scoreboard.in_flight, rate, round_start)
+        self.metrics.record(t, self.cc.cwnd)  # 记录cwnd变化
+        return sample
+
+    def on_timeout(self):
+        # 超时重传：交给拥塞控制算法处理（通常回到慢启动）
+        super().on_timeout()
+        self.cc.on_rto(now())
+        self.dup_ack_count = 0
+        self.recover = self.scoreboard.snd_max
+        self.metrics.record(now(), self.cc.cwnd)
+
+    async def receive(self, packet, peer):
+        await super().receive(packet, peer)
+        if packet.ack_flag:
+            if packet.ece and packet.ack >= self.recover:
+                # ECN 拥塞回显（RFC 3168 6.1.2）：与丢包一样减窗，同一窗口内只减一次
+                self.cc.on_loss(now())
+                self.recover = self.scoreboard.snd_max
+                self.metrics.record(now(), self.cc.cwnd)
+            if packet.ack > self.last_ack:
+                # 新的ACK
+                self.dup_ack_count = 0
+                self.last_ack = packet.ack
+            elif packet.ack == self.last_ack:
+                # 重复ACK
+                self.dup_ack_count += 1
+                if self.dup_ack_count == 3:
+                    # 三次重复ACK，快速重传；同一窗口内的多处丢包只通知一次。
+                    # 算法选择忽略随机丢包时，按本次丢包之前的历史诊断为随机丢包的只重传不减窗
+                    ignore = self.cc.ignore_random_loss and self.path.random_loss
+                    self.path.on_loss(now())
+                    if packet.ack >= self.recover and not ignore:
+                        self.cc.on_loss(now())
+                        self.recover = self.scoreboard.snd_max
+                        self.metrics.record(now(), self.cc.cwnd)  # 记录cwnd变化
+                    lost = self.scoreboard.get(packet.ack)
+                    if lost:
+                        await self._retransmit(lost)
+            # 调整发送窗口
+            await self._fill_window(peer)
 
 class Router:
-    def __init__(self, send_interval=0.001, max_buffer_size=100):
-        self.buffer = []  # 使用列表作为缓存
-        self.max_buffer_size = max_buffer_size
+    def __init__(self, send_interval=0.001, max_buffer_size=100, queue=None, bandwidth=None, delay=None, monitor=None, tracer=None, next_hop=None, name=None):
+        # 缓存队列，默认尾部丢弃；也可传入 REDQueue / CoDelQueue
+        self.buffer = queue if queue is not None else TailDropQueue(max_buffer_size)
+        if name is not None and getattr(self.buffer, 'name', '') is None:
+            # 没有起名字的队列（如拓扑里由工厂为每条链路新建的 RED 队列）沿用 Router 的名字
+            self.buffer.rename(name)
+        self.max_buffer_size = self.buffer.max_size
         self.send_interval = send_interval
-        # 启动发送任务
-        asyncio.create_task(self.send_packets())
+        self.bandwidth = bandwidth  # 链路带宽（字节/秒），为 None 时每个包占用 send_interval
+        self.delay = delay  # 传播时延，为 None 时沿用接收方的 rtt±jitter
+        self.busy = False  # 链路上是否有包正在发送
+        self.link_free = 0.0  # 链路空闲的时刻
+        # 可选的统计对象，需实现 on_drop(item) 和 on_dequeue(item, sojourn)
+        self.monitor = monitor
+        self.tracer = tracer  # 可选的 tracefile.TraceWriter，记录入队/丢包/交付事件
+        # 多跳拓扑中链路对端的节点（需实现 enqueue），为 None 时直接交给接收方
+        self.next_hop = next_hop
+        # 并行模式下跨分区的链路：包在发出时交给 outbox(到达时刻, packet, sender, receiver)，
+        # 由对端分区在到达时刻投递
+        self.outbox = None
+        # 沿用接收方 rtt±jitter 时的抖动随机数流；name（如链路名）使它不受其它 Router 创建顺序的影响
+        self.rng = rng.unique('router' if name is None else f"router/{name}")
+        self.buffer.on_drop = self._on_drop
 
     async def forward(self, packet, sender, receiver):
-        if len(self.buffer) >= self.max_buffer_size:
-            # 缓存已满，丢弃数据包
+        self.enqueue(packet, sender, receiver)
+
+    def enqueue(self, packet, sender, receiver):
+        # 缓存已满时由队列丢弃数据包；链路空闲时立即开始发送
+        if not self.buffer.enqueue((packet, sender, receiver), now()):
             return
-        # 将包添加到缓存队列
-        self.buffer.append((packet, sender, receiver))
+        if self.tracer is not None:
+            self.tracer.record(ENQUEUE, now(), sender, packet)
+        if not self.busy:
+            self.busy = True
+            self._transmit_next()
 
-    async def send_packets(self):
+    def _on_drop(self, item):
+        if self.monitor is not None:
+            self.monitor.on_drop(item)
+        if self.tracer is not None:
+            self.tracer.record(DROP, now(), item[1], item[0])
+
+    def _service_time(self, packet):
+        if self.bandwidth is None:
+            return self.send_interval
+        return (packet.length + HEADER_SIZE) / self.bandwidth
+
+    def _transmit_next(self):
+        # 只在有包时安排下一次出队，空闲链路不产生任何定时器。
+        # 链路时间精确累加在 link_free 上，时间轮只负责唤醒，
+        # 一次唤醒内已经发送完的包连续处理，发送速率不受 tick 粒度限制
+        t = now()
+        wheel = get_wheel()
         while True:
-            if self.buffer:
-                # 从列表中取出第一个包并发送
-                packet, sender, receiver = self.buffer.pop(0)
-                # 创建任务处理发送延迟和接收
-                asyncio.create_task(self._deliver_packet(packet, sender, receiver))
-            await asyncio.sleep(self.send_interval)
-    
-    async def _deliver_packet(self, packet, sender, receiver):
-        # 模拟发送延迟
-        await asyncio.sleep(receiver.rtt + random.uniform(-receiver.jitter, receiver.jitter))
-        await receiver.receive(packet, sender)
+            item = self.buffer.dequeue(t)
+            if item is None:
+                self.busy = False
+                return
+            if self.monitor is not None:
+                self.monitor.on_dequeue(item, self.buffer.last_sojourn)
+            packet, sender, receiver = item
+            start = max(self.link_free, t - self.buffer.last_sojourn)
+            self.link_free = start + self._service_time(packet)
+            if self.delay is None:
+                delay = receiver.rtt + self.rng.uniform(-receiver.jitter, receiver.jitter)
+            else:
+                delay = self.delay
+            if self.outbox is not None:
+                self.outbox(self.link_free + delay, packet, sender, receiver)
+            else:
+                wheel.schedule_at(self.link_free + delay, self._deliver_packet, packet, sender, receiver)
+            if self.link_free > t:
+                wheel.schedule_at(self.link_free, self._transmit_next)
+                return
 
+    def _deliver_packet(self, packet, sender, receiver):
+        if self.tracer is not None:
+            self.tracer.record(DELIVER, now(), sender, packet)
+        if self.next_hop is not None:
+            self.next_hop.enqueue(packet, sender, receiver)
+        else:
+            dispatch(receiver.receive(packet, sender))
@@ -0,0 +1,375 @@
+import os
+import sys
+import math
+import heapq
+import struct
+import asyncio
+import argparse
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from frame import TCPPacket, run as run_loop, now
+import rng
+from timerwheel import TICK, get_wheel
+from topology import Topology, TopologyScenario, stop_time
+
+# 保守式并行离散事件仿真（YAWNS 式同步窗口）。
+# 拓扑的节点分到若干个进程，每个进程用同一个 build() 构建出完全相同的场景（包括按名字派生的
+# 随机数流），但只运行本分区节点上的主机和出链路。两端在不同分区的链路称为切割链路：包离开链路时
+# 已经知道到达时刻，写进发送分区的共享内存 outbox，到达时刻至少在切割链路的传播时延（lookahead）之后。
+# 所有进程以略小于 lookahead 的窗口同步推进，每个窗口结束时交换 outbox，收到的包按到达时刻放进
+# 本分区的时间轮，所以不会有迟到的事件。
+# 时间轮按精确时间排序同一 tick 内的事件，同一时刻的链路到达按链路编号排序，与它们在哪个进程里
+# 被安排无关；TopologyScenario.run 的顺序运行用的也是这个次序，所以两者结果逐位一致。唯一的区别是跨分区传递的是包的副本：
+# 对端分区里的 ECN 标记不会改到发送端保留的原包上
+
+MAX_SACK = 4  # TCP 选项最多放下 4 个 SACK 块（RFC 2018）
+# 到达时刻, 目的分区, 链路编号, sender 编号, receiver 编号, seq, ack, 载荷长度, 标志位, SACK 块数, SACK 块
+MESSAGE = struct.Struct('<diiiiqqiBB%dq' % (2 * MAX_SACK))
+# 与 MESSAGE 逐字节对应的 NumPy 结构体（不对齐），接收端按目的分区筛选
+DTYPE = np.dtype([('when', '<f8'), ('dest', '<i4'), ('link', '<i4'), ('sender', '<i4'), ('receiver', '<i4'),
+                  ('seq', '<i8'), ('ack', '<i8'), ('length', '<i4'), ('flags', 'u1'), ('nsack', 'u1'),
+                  ('sack', '<i8', (MAX_SACK, 2))])
+QUEUE_STATS = ('enqueued', 'dequeued', 'dropped', 'marked', 'max_occupancy', 'sojourn_total', 'sojourn_max')
+
+def _groups(topology, lookahead):
+    # 时延小于 lookahead 的链路两端必须在同一分区：按这些链路做并查集
+    parent = {node: node for node in topology.nodes.values()}
+
+    def find(node):
+        while parent[node] is not node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for link in topology.links:
+        if link.delay < lookahead:
+            a, b = find(link.src), find(link.dst)
+            if a is not b:
+                parent[b] = a
+    groups = {}
+    for node in topology.nodes.values():
+        groups.setdefault(find(node), []).append(node)
+    return list(groups.values())
+
+def partition(topology, parts, flows=(), lookahead=None):
+    # 把节点分成 parts 份，返回 节点名 -> 分区号。lookahead 为允许切开的最小链路时延，
+    # 默认取能分出至少 parts 组的最大时延；各组按经过它的流路径数（近似负载）从大到小
+    # 放进当前最轻的分区
+    if parts <= 1:
+        return {name: 0 for name in topology.nodes}
+    if lookahead is None:
+        delays = sorted({link.delay for link in topology.links}, reverse=True)
+        lookahead = next((d for d in delays if len(_groups(topology, d)) >= parts), 0.0)
+    groups = _groups(topology, lookahead)
+    if len(groups) < parts:
+        raise ValueError(f"Only {len(groups)} groups of nodes are joined by links of at least {lookahead}s")
+    load = dict.fromkeys(topology.nodes.values(), 1)
+    for flow in flows:
+        for node in topology.path(flow.src, flow.dst):
+            load[node] += 1
+    weights = [sum(load[node] for node in group) for group in groups]
+    heap = [(0, i) for i in range(parts)]
+    assignment = {}
+    for g in sorted(range(len(groups)), key=lambda g: -weights[g]):
+        weight, part = heapq.heappop(heap)
+        for node in groups[g]:
+            assignment[node.name] = part
+        heapq.heappush(heap, (weight + weights[g], part))
+    return assignment
+
+def lookahead_of(topology, assignment):
+    # 切割链路的最小传播时延；没有切割链路时为 inf
+    delays = [link.delay for link in topology.links if assignment[link.src.name] != assignment[link.dst.name]]
+    return min(delays) if delays else math.inf
+
+def window_ticks(lookahead, tick=TICK):
+    # 同步窗口的 tick 数。链路一次唤醒内补发的包可能比当前时刻早不到一个 tick 开始发送，
+    # 所以窗口比 lookahead 少一个 tick，保证窗口内发出的包都落在下一个窗口或更晚
+    return int(lookahead / tick + 1e-9) - 1
+
+class _Partition:
+    # 一个分区：完整构建场景，只运行本分区节点上的流和链路
+    def __init__(self, build, seed, assignment, part, duration, lookahead, boxes, counts, barrier, capacity):
+        rng.seed(seed)
+        self.scenario = scenario = build()
+        scenario.duration = duration
+        topology = scenario.topology
+        topology.compute_routes()
+        self.part = part
+        self.duration = duration
+        self.lookahead = lookahead
+        self.local = {node for node in topology.nodes.values() if assignment[node.name] == part}
+        self.links = topology.links
+        self.conns = [conn for flow in scenario.flows for conn in (flow.sender, flow.receiver)]
+        self.ids = {conn: i for i, conn in enumerate(self.conns)}
+        self.boxes = boxes  # 每个分区一个 outbox，两半轮流使用，每个窗口只需一次同步
+        self.counts = counts  # [半区, 分区] -> 该窗口写入的消息数
+        self.barrier = barrier
+        self.capacity = capacity
+        self.count = 0
+        self.offset = 0
+        self.overflow = 0
+        self.sent = 0
+        self.windows = 0
+        self.assignment = assignment
+
+    def _emitter(self, dest, index):
+        pack_into, size = MESSAGE.pack_into, MESSAGE.size
+        buf = self.boxes[self.part].buf
+        ids = self.ids
+        pad = (0,) * (2 * MAX_SACK)
+
+        def emit(when, packet, sender, receiver):
+            n = self.count
+            if n == self.capacity:
+                # 回调里的异常会被事件循环吞掉，先记下，到同步点再报错
+                self.overflow += 1
+                return
+            sack = packet.sack[:MAX_SACK] if packet.sack else ()
+            blocks = tuple(x for block in sack for x in block)
+            pack_into(buf, self.offset + n * size, when, dest, index, ids[sender], ids[receiver], packet.seq,
+                      packet.ack, packet.length, packet.flags, len(sack), *blocks, *pad[len(blocks):])
+            self.count = n + 1
+        return emit
+
+    def _exchange(self, half):
+        if self.overflow:
+            raise RuntimeError(f"{self.count + self.overflow} packets crossed partitions in one window "
+                               f"(capacity {self.capacity}); raise capacity")
+        self.counts[half, self.part] = self.count
+        self.sent += self.count
+        self.count = 0
+        self.offset = (1 - half) * self.capacity * MESSAGE.size
+        self.barrier.wait()
+        received = []
+        for src, box in enumerate(self.boxes):
+            n = int(self.counts[half, src])
+            if src == self.part or not n:
+                continue
+            messages = np.frombuffer(box.buf, DTYPE, n, half * self.capacity * MESSAGE.size)
+            received.append(messages[messages['dest'] == self.part])
+            del messages
+        if received:
+            messages = np.concatenate(received)
+            # 按到达时刻投递；同一条链路上的包本来就按发出顺序排列，排序稳定
+            self._inject(messages[np.lexsort((messages['link'], messages['when']))])
+
+    def _inject(self, messages):
+        wheel = get_wheel()
+        links, conns, payload = self.links, self.conns, self.scenario.payload
+        for when, _, link, sender, receiver, seq, ack, length, flags, nsack, sack in messages.tolist():
+            # 场景里所有数据段共用一块载荷，接收端只关心长度
+            packet = TCPPacket.segment(payload, 0, length, seq, ack)
+            packet.flags = flags
+            if nsack:
+                packet.sack = tuple(tuple(block) for block in sack[:nsack])
+            wheel.schedule_ranked(when, link, links[link].router._deliver_packet, packet, conns[sender], conns[receiver])
+
+    async def _main(self):
+        # 与 TopologyScenario._main 相同的事件次序，只是切割链路改为写进 outbox
+        scenario = self.scenario
+        wheel = get_wheel()
+        scenario._rank_links(wheel)
+        for index, link in enumerate(self.links):
+            if link.src in self.local and link.dst not in self.local:
+                link.router.outbox = self._emitter(self.assignment[link.dst.name], index)
+        hosts = scenario.topology.hosts
+        for flow in scenario.flows:
+            if hosts[flow.sender] in self.local:
+                wheel.schedule_at(flow.start, scenario._start, flow)
+        end = round(self.duration / wheel.tick)
+        window = window_ticks(self.lookahead, wheel.tick)
+        for k, stop in enumerate(range(window, end + window, window)):
+            await asyncio.sleep(stop_time(min(stop, end) * wheel.tick, wheel.tick) - now())
+            self.windows = k + 1
+            if stop < end:
+                self._exchange(k % 2)
+
+    def run(self):
+        run_loop(self._main())
+        return self.report()
+
+    def report(self):
+        # 本分区拥有的那部分结果：发送端/接收端各自的计数，以及本分区发出的链路
+        scenario = self.scenario
+        hosts = scenario.topology.hosts
+        flows = {}
+        for i, flow in enumerate(scenario.flows):
+            values = flows[i] = {}
+            if hosts[flow.sender] in self.local:
+                values['retransmissions'] = flow.sender.retransmissions
+                values['srtt'] = flow.sender.rto.srtt
+            if hosts[flow.receiver] in self.local:
+                values['ack'] = flow.receiver.ack
+        links = {}
+        for index, link in enumerate(self.links):
+            if link.src in self.local:
+                links[index] = {
+                    'bytes': link.monitor.bytes,
+                    'flows': {self.ids[sender]: stats for sender, stats in link.monitor.flows.items()},
+                    'queue': {name: getattr(link.router.buffer, name) for name in QUEUE_STATS},
+                }
+        return {'flows': flows, 'links': links, 'windows': self.windows, 'messages': self.sent + self.count}
+
+def _merge(scenario, report):
+    # 把一个分区的结果写回父进程里的场景副本，之后直接用 TopologyScenario.results()
+    conns = [conn for flow in scenario.flows for conn in (flow.sender, flow.receiver)]
+    for i, values in report['flows'].items():
+        flow = scenario.flows[i]
+        if 'ack' in values:
+            flow.receiver.ack = values['ack']
+        if 'srtt' in values:
+            flow.sender.retransmissions = values['retransmissions']
+            flow.sender.rto.srtt = values['srtt']
+    for index, values in report['links'].items():
+        link = scenario.topology.links[index]
+        link.monitor.bytes = values['bytes']
+        link.monitor.flows = {conns[i]: stats for i, stats in values['flows'].items()}
+        for name, value in values['queue'].items():
+            setattr(link.router.buffer, name, value)
+
+def _worker(build, seed, assignment, part, duration, lookahead, names, capacity, barrier, pipe):
+    boxes = [shared_memory.SharedMemory(name) for name in names[:-1]]
+    counts_shm = shared_memory.SharedMemory(names[-1])
+    counts = np.ndarray((2, len(boxes)), dtype=np.int64, buffer=counts_shm.buf)
+    try:
+        partition = _Partition(build, seed, assignment, part, duration, lookahead, boxes, counts, barrier, capacity)
+        pipe.send(('ok', partition.run()))
+    except BaseException:
+        # 让其它分区在同步点上退出，而不是一直等下去
+        barrier.abort()
+        pipe.send(('error', traceback.format_exc()))
+    finally:
+        del counts
+        for shm in boxes + [counts_shm]:
+            shm.close()
+        pipe.close()
+
+def _run_processes(build, seed, assignment, parts, duration, lookahead, capacity):
+    ctx = mp.get_context('spawn')
+    shms = [shared_memory.SharedMemory(create=True, size=2 * capacity * MESSAGE.size) for _ in range(parts)]
+    shms.append(shared_memory.SharedMemory(create=True, size=2 * parts * 8))
+    names = [shm.name for shm in shms]
+    barrier = ctx.Barrier(parts)
+    procs, pipes = [], []
+    try:
+        for part in range(parts):
+            reader, writer = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_worker, args=(build, seed, assignment, part, duration, lookahead, names,
+                                                     capacity, barrier, writer))
+            proc.start()
+            writer.close()
+            procs.append(proc)
+            pipes.append(reader)
+        replies = []
+        for part, reader in enumerate(pipes):
+            try:
+                replies.append(reader.recv())
+            except EOFError:
+                replies.append(('error', f"partition {part} exited with code {procs[part].exitcode}"))
+        for proc in procs:
+            proc.join()
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    errors = [reply for status, reply in replies if status == 'error']
+    if errors:
+        # 优先报告真正出错的分区，而不是因为同步被中止而退出的分区
+        errors.sort(key=lambda error: 'BrokenBarrierError' in error)
+        raise RuntimeError(f"Partition failed:\n{errors[0]}")
+    return [reply for _, reply in replies]
+
+def cores():
+    # 本进程可用的 CPU 数
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def run(build, parts=2, duration=10.0, seed=0, assignment=None, lookahead=None, capacity=1 << 16):
+    # build: 不带参数、可 pickle 的函数（模块级函数或其 functools.partial），返回一个 TopologyScenario，
+    # 每个进程各自调用它。assignment 为 节点名 -> 分区号，默认由 partition() 划分。
+    # 结果与 rng.seed(seed); build().run(duration) 的顺序运行逐位一致。
+    # 并行只在每个分区都有一个空闲核、且每个同步窗口（约 lookahead）里各分区的事件足够多时才划算：
+    # 每个窗口都要同步一次，核不够时各进程轮流占用 CPU，只剩同步开销。所以自动划分时分区数不超过可用核数，
+    # 只有一个核（或 parts=1）时直接在本进程内顺序运行；显式给出的 assignment 照原样执行，分区多于核数时只打印警告
+    rng.seed(seed)
+    scenario = build()
+    topology = scenario.topology
+    topology.compute_routes()
+    if assignment is None:
+        assignment = partition(topology, min(parts, cores()), scenario.flows, lookahead)
+    parts = max(assignment.values()) + 1
+    if parts > cores():
+        print(f"warning: {parts} partitions on {cores()} core(s), the processes will share CPUs", file=sys.stderr)
+    lookahead = lookahead_of(topology, assignment)
+    if parts == 1:
+        results = scenario.run(duration)
+        results['parallel'] = {'parts': 1, 'lookahead': lookahead, 'windows': 1, 'messages': 0}
+        return results
+    if window_ticks(lookahead) < 1:
+        raise ValueError(f"Cut links need a delay of at least {2 * TICK}s, got {lookahead}s")
+    reports = _run_processes(build, seed, assignment, parts, duration, lookahead, capacity)
+    scenario.duration = duration
+    for report in reports:
+        _merge(scenario, report)
+    results = scenario.results()
+    results['parallel'] = {
+        'parts': parts,
+        'lookahead': lookahead,
+        'windows': reports[0]['windows'],
+        'messages': sum(report['messages'] for report in reports),
+    }
+    return results
+
+def clusters(n=4, hosts=8, bandwidth=1.25e6, core_bandwidth=None, delay=0.005, access_delay=0.0005,
+             buffer_size=100, algorithm='reno', size=None):
+    # 演示/测试用的场景：n 个机架交换机连成环（时延 delay 的核心链路），每个机架挂 hosts 台主机
+    # （时延 access_delay 的接入链路）；机架 i 的第 j 台主机向机架 i+1 的第 j 台主机发一条流
+    core_bandwidth = core_bandwidth or bandwidth * hosts / 2
+    topology = Topology()
+    for i in range(n):
+        topology.add_node(f"c{i}")
+        for j in range(hosts):
+            topology.add_node(f"c{i}h{j}")
+            topology.add_link(f"c{i}h{j}", f"c{i}", bandwidth, access_delay, buffer_size)
+    for i in range(n):
+        topology.add_link(f"c{i}", f"c{(i + 1) % n}", core_bandwidth, delay, buffer_size)
+    scenario = TopologyScenario(topology)
+    for i in range(n):
+        for j in range(hosts):
+            scenario.add_flow(algorithm, f"c{i}h{j}", f"c{(i + 1) % n}h{j}", start=0.001 * j, size=size)
+    return scenario
+
+def main():
+    import time
+    from functools import partial
+    parser = argparse.ArgumentParser(description="Compare a sequential and a partitioned run of the clusters scenario")
+    parser.add_argument('--clusters', type=int, default=4)
+    parser.add_argument('--hosts', type=int, default=8)
+    parser.add_argument('--parts', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    build = partial(clusters, args.clusters, args.hosts)
+    timings = {}
+    results = {}
+    for parts in (1, args.parts):
+        start = time.perf_counter()
+        results[parts] = run(build, parts, args.duration, args.seed)
+        timings[parts] = time.perf_counter() - start
+        info = results[parts]['parallel']
+        print(f"parts={info['parts']}: {timings[parts]:.2f}s, lookahead {info['lookahead']}s, "
+              f"{info['windows']} windows, {info['messages']} cut-link packets")
+    if results[args.parts]['parallel']['parts'] < args.parts:
+        print(f"only {cores()} core(s) available: ran {results[args.parts]['parallel']['parts']} partition(s)")
+    print(f"speedup {timings[1] / timings[args.parts]:.2f}x, identical: {results[1]['flows'] == results[args.parts]['flows']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import math
+
+# 路径状态（见 next.ipynb 中的诊断表）
+HEALTHY = 'healthy'  # 没有问题
+CONGESTION = 'congestion'  # 稳定拥塞：时延大、时延方差小
+BURST = 'burst'  # 突发拥塞：时延大、时延方差大
+RANDOM_LOSS_HIGH = 'random_loss_high'  # 随机丢包（高）：时延小、带宽小且方差大
+RANDOM_LOSS_LOW = 'random_loss_low'  # 随机丢包（低）：时延小、带宽大且方差小
+
+class RunningStats:
+    # 指数加权的均值和方差（Welford 递推的 EWMA 形式），每个样本 O(1)；
+    # window 为等效的滑动窗口样本数
+    __slots__ = ('alpha', 'mean', 'var', 'count')
+
+    def __init__(self, window=32):
+        self.alpha = 2 / (window + 1)
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, x):
+        self.count += 1
+        if self.count == 1:
+            self.mean = x
+            return
+        diff = x - self.mean
+        incr = self.alpha * diff
+        self.mean += incr
+        self.var = (1 - self.alpha) * (self.var + diff * incr)
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+class PathState:
+    # 发送端的在线路径诊断：由 ACK 带来的 RTT 和交付速率样本维护均值/方差，
+    # 丢包时据此判断是拥塞丢包还是随机丢包，拥塞控制可以只对前者减窗。
+    #   delay_threshold: 排队时延超过 min_rtt 的这个比例算"时延大"
+    #   jitter_threshold: RTT 标准差超过 min_rtt 的这个比例算"时延方差大"
+    #   rate_cv_threshold: 交付速率的变异系数超过它算"带宽方差大"
+    #   loss_window: 丢包频率按 ACK 样本数衰减的等效窗口
+    #   spike_threshold: 丢包时的排队时延超过近期排队时延范围的这个比例，算队列已满（拥塞丢包）
+    #   spike_backlog: 近期排队时延范围按交付速率折算不到这么多个包时，视为没有形成队列
+    def __init__(self, window=32, delay_threshold=0.2, jitter_threshold=0.1, rate_cv_threshold=0.5,
+                 loss_window=256, min_rtt_window=10.0, spike_threshold=0.5, spike_backlog=1.0):
+        self.rtt = RunningStats(window)
+        self.rate = RunningStats(window)
+        self.delay_threshold = delay_threshold
+        self.jitter_threshold = jitter_threshold
+        self.rate_cv_threshold = rate_cv_threshold
+        self.loss_alpha = 2 / (loss_window + 1)
+        self.loss = 0.0  # 每个 ACK 样本的丢包事件频率（EWMA）
+        self.min_rtt = None  # 传播时延估计，保持到被追平或过期
+        self.min_rtt_stamp = 0.0
+        self.min_rtt_window = min_rtt_window
+        self.max_rtt = None  # 近期最大 RTT，同样保持到被超过或过期
+        self.max_rtt_stamp = 0.0
+        self.last_rtt = None  # 最近一个 RTT 样本
+        self.spike_threshold = spike_threshold
+        self.spike_backlog = spike_backlog
+
+    def on_sample(self, t, rtt=None, rate=0.0):
+        if rtt is not None and rtt > 0:
+            self.rtt.update(rtt)
+            if self.min_rtt is None or rtt <= self.min_rtt or t - self.min_rtt_stamp > self.min_rtt_window:
+                self.min_rtt = rtt
+                self.min_rtt_stamp = t
+            if self.max_rtt is None or rtt >= self.max_rtt or t - self.max_rtt_stamp > self.min_rtt_window:
+                self.max_rtt = rtt
+                self.max_rtt_stamp = t
+            self.last_rtt = rtt
+        if rate > 0:
+            self.rate.update(rate)
+        self.loss *= 1 - self.loss_alpha
+
+    def on_loss(self, t):
+        self.loss += self.loss_alpha
+
+    @property
+    def queueing_delay(self):
+        if self.min_rtt is None:
+            return 0.0
+        return max(self.rtt.mean - self.min_rtt, 0.0)
+
+    @property
+    def state(self):
+        if self.min_rtt is None:
+            return HEALTHY
+        if self.queueing_delay > self.delay_threshold * self.min_rtt:
+            return BURST if self.rtt.std > self.jitter_threshold * self.min_rtt else CONGESTION
+        if self.loss > 0.1 * self.loss_alpha:  # 最近约 loss_window 个样本内有过丢包
+            cv = self.rate.std / self.rate.mean if self.rate.mean > 0 else 0.0
+            return RANDOM_LOSS_HIGH if cv > self.rate_cv_threshold else RANDOM_LOSS_LOW
+        return HEALTHY
+
+    @property
+    def spike(self):
+        # 最近的 RTT 落在近期范围的上部：浅缓存下平均排队时延不大，但丢包时队列是满的
+        span = self.max_rtt - self.min_rtt
+        if span * self.rate.mean < self.spike_backlog:
+            return False
+        return self.last_rtt - self.min_rtt > self.spike_threshold * span
+
+    @property
+    def random_loss(self):
+        # 在记录本次丢包之前调用：此前已经反复丢包、平均排队时延小，而且丢包时队列没有满，
+        # 才认为与排队无关；路径上的第一次丢包总按拥塞处理
+        return self.state in (RANDOM_LOSS_HIGH, RANDOM_LOSS_LOW) and not self.spike
@@ -0,0 +1,188 @@
+import math
+from collections import deque
+import rng
+
+class TailDropQueue:
+    # 基于 deque 的先进先出队列，入队/出队均为 O(1)；队满时丢弃新到的包
+    def __init__(self, max_size=100, ecn=False):
+        self.max_size = max_size
+        self.ecn = ecn
+        self.items = deque()  # (入队时间, item)，item 为 (packet, sender, receiver)
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.marked = 0
+        self.max_occupancy = 0
+        self.sojourn_total = 0.0
+        self.sojourn_max = 0.0
+        self.last_sojourn = 0.0  # 最近一个出队包的排队时延
+        self.on_drop = None  # 丢包回调 on_drop(item)，用于按流统计
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def enqueue(self, item, now):
+        if len(self.items) >= self.max_size:
+            self._drop(item)
+            return False
+        self.items.append((now, item))
+        self.enqueued += 1
+        if len(self.items) > self.max_occupancy:
+            self.max_occupancy = len(self.items)
+        return True
+
+    def dequeue(self, now):
+        if not self.items:
+            return None
+        return self._deliver(self.items.popleft(), now)
+
+    def _deliver(self, entry, now):
+        enqueued_at, item = entry
+        sojourn = self.last_sojourn = now - enqueued_at
+        self.dequeued += 1
+        self.sojourn_total += sojourn
+        if sojourn > self.sojourn_max:
+            self.sojourn_max = sojourn
+        return item
+
+    def _drop(self, item):
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    def _mark(self, item):
+        # 支持 ECN 时打 CE 标记代替丢包
+        item[0].ce = True
+        self.marked += 1
+
+    @property
+    def mean_sojourn(self):
+        return self.sojourn_total / self.dequeued if self.dequeued else 0.0
+
+    def stats(self):
+        return {
+            'occupancy': len(self.items),
+            'max_occupancy': self.max_occupancy,
+            'enqueued': self.enqueued,
+            'dequeued': self.dequeued,
+            'dropped': self.dropped,
+            'marked': self.marked,
+            'mean_sojourn': self.mean_sojourn,
+            'max_sojourn': self.sojourn_max,
+        }
+
+class REDQueue(TailDropQueue):
+    # Random Early Detection：按平均队长在 min_th~max_th 之间线性提高丢包/标记概率
+    # name（如链路名）决定随机数流，使它不受其它 RED 队列创建顺序的影响
+    def __init__(self, max_size=100, min_th=None, max_th=None, max_p=0.1, weight=0.002, ecn=False, name=None):
+        super().__init__(max_size, ecn)
+        self.min_th = max_size / 4 if min_th is None else min_th
+        self.max_th = max_size * 3 / 4 if max_th is None else max_th
+        self.max_p = max_p
+        self.weight = weight
+        self.avg = 0.0
+        self.count = 0  # 上次丢包/标记以来进入的包数
+        self.name = name
+        self.rng = rng.unique('red' if name is None else f"red/{name}")  # 早期丢包的随机数流
+
+    def rename(self, name):
+        # 换成按 name 派生的随机数流；只应在开始运行之前调用
+        self.name = name
+        self.rng = rng.unique(f"red/{name}")
+
+    def enqueue(self, item, now):
+        self.avg += self.weight * (len(self.items) - self.avg)
+        if self.avg >= self.max_th:
+            self.count = 0
+            self._drop(item)
+            return False
+        if self.avg >= self.min_th:
+            self.count += 1
+            p_b = self.max_p * (self.avg - self.min_th) / (self.max_th - self.min_th)
+            p_a = p_b / max(1 - self.count * p_b, 1e-9)
+            if self.rng.random() < p_a:
+                self.count = 0
+                if not self.ecn:
+                    self._drop(item)
+                    return False
+                self._mark(item)
+        else:
+            self.count = -1
+        return super().enqueue(item, now)
+
+class CoDelQueue(TailDropQueue):
+    # CoDel (RFC 8289)：排队时延持续超过 target 一个 interval 后开始在出队端丢包/标记
+    def __init__(self, max_size=1000, target=0.005, interval=0.1, ecn=False):
+        super().__init__(max_size, ecn)
+        self.target = target
+        self.interval = interval
+        self.first_above_time = 0.0
+        self.drop_next = 0.0
+        self.count = 0
+        self.last_count = 0
+        self.dropping = False
+
+    def _control_law(self, t):
+        return t + self.interval / math.sqrt(self.count)
+
+    def _pop(self, now):
+        # 返回 (entry, ok_to_drop)
+        if not self.items:
+            self.first_above_time = 0.0
+            return None, False
+        entry = self.items.popleft()
+        ok_to_drop = False
+        if now - entry[0] < self.target or not self.items:
+            self.first_above_time = 0.0
+        elif self.first_above_time == 0.0:
+            self.first_above_time = now + self.interval
+        elif now >= self.first_above_time:
+            ok_to_drop = True
+        return entry, ok_to_drop
+
+    def _congestion_signal(self, entry):
+        # 标记后照常发送返回 True；丢弃返回 False
+        if self.ecn:
+            self._mark(entry[1])
+            return True
+        self._drop(entry[1])
+        return False
+
+    def dequeue(self, now):
+        entry, ok_to_drop = self._pop(now)
+        if entry is None:
+            self.dropping = False
+            return None
+        if self.dropping:
+            if not ok_to_drop:
+                self.dropping = False
+            while self.dropping and now >= self.drop_next:
+                self.count += 1
+                if self._congestion_signal(entry):
+                    self.drop_next = self._control_law(self.drop_next)
+                    break
+                entry, ok_to_drop = self._pop(now)
+                if entry is None:
+                    self.dropping = False
+                    return None
+                if not ok_to_drop:
+                    self.dropping = False
+                else:
+                    self.drop_next = self._control_law(self.drop_next)
+        elif ok_to_drop:
+            delta = self.count - self.last_count
+            if delta > 1 and now - self.drop_next < 16 * self.interval:
+                self.count = delta
+            else:
+                self.count = 1
+            self.drop_next = self._control_law(now)
+            self.last_count = self.count
+            self.dropping = True
+            if not self._congestion_signal(entry):
+                entry, _ = self._pop(now)
+                if entry is None:
+                    return None
+        return self._deliver(entry, now)
@@ -0,0 +1,54 @@
+from bisect import bisect_left, bisect_right
+
+class ReassemblyQueue:
+    # 接收端的乱序重组队列：不相交的 [start, end) 区间按起点排序存放，
+    # 插入时和重叠/相接的区间合并，查找 O(log n)
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.recent = []  # 最近变化的区间起点（最多 4 个），SACK 块按此顺序上报（RFC 2018）
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def add(self, start, end):
+        # 返回合并后的区间
+        starts, ends = self.starts, self.ends
+        i = bisect_left(ends, start)  # 第一个与之重叠或相接的区间
+        j = bisect_right(starts, end)  # 之后的区间都在它后面
+        if i < j:
+            start = min(start, starts[i])
+            end = max(end, ends[j - 1])
+            del starts[i:j], ends[i:j]
+        starts.insert(i, start)
+        ends.insert(i, end)
+        self.recent = [start] + [s for s in self.recent if s != start and self._index(s) is not None][:3]
+        return start, end
+
+    def advance(self, ack):
+        # 累积确认推进到 ack 后，接上所有已经连续的区间，返回新的 ack
+        starts, ends = self.starts, self.ends
+        n = 0
+        while n < len(starts) and starts[n] <= ack:
+            ack = max(ack, ends[n])
+            n += 1
+        if n:
+            del starts[:n], ends[:n]
+            self.recent = [s for s in self.recent if s >= ack]
+        return ack
+
+    def _index(self, start):
+        i = bisect_left(self.starts, start)
+        return i if i < len(self.starts) and self.starts[i] == start else None
+
+    def blocks(self, n=3):
+        # 最多 n 个 SACK 块：最近变化的区间在前
+        blocks = []
+        for start in self.recent[:n]:
+            i = self._index(start)
+            if i is not None:
+                blocks.append((start, self.ends[i]))
+        return tuple(blocks)
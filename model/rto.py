@@ -0,0 +1,33 @@
+class RTOEstimator:
+    # RFC 6298 重传超时估计：SRTT/RTTVAR 平滑，超时后指数退避
+    def __init__(self, initial=1.0, min_rto=0.2, max_rto=60.0, granularity=0.001, alpha=1/8, beta=1/4, k=4):
+        self.initial = initial
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.granularity = granularity
+        self.alpha = alpha
+        self.beta = beta
+        self.k = k
+        self.srtt = None
+        self.rttvar = None
+        self.base = initial  # 未退避的 RTO
+        self.backoff = 1
+
+    @property
+    def rto(self):
+        return min(self.base * self.backoff, self.max_rto)
+
+    def sample(self, r):
+        # 只能用未重传过的包的 RTT 样本（Karn 算法由调用方保证）
+        if self.srtt is None:
+            self.srtt = r
+            self.rttvar = r / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - r)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * r
+        self.base = min(max(self.srtt + max(self.granularity, self.k * self.rttvar), self.min_rto), self.max_rto)
+        self.backoff = 1
+
+    def back_off(self):
+        if self.base * self.backoff < self.max_rto:
+            self.backoff *= 2
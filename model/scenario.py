@@ -0,0 +1,220 @@
+import os
+import pickle
+import asyncio
+import itertools
+import traceback
+from frame import Router, TCPConnection, TCPPacket, VirtualTimeEventLoop, dispatch, run, transplant
+from cc import ALGORITHMS as ALGORITHMS_CC, BBR, switch
+from Reno import RenoTCPConnection
+from Cubic import CubicTCPConnection
+from BBR import BBRTCPConnection
+from tracefile import TraceWriter
+
+# 可用的拥塞控制算法，其它模块可以往这里注册
+ALGORITHMS = {
+    'reno': RenoTCPConnection,
+    'cubic': CubicTCPConnection,
+    'bbr': BBRTCPConnection,
+}
+
+def jain_index(values):
+    # Jain 公平性指数：(Σx)^2 / (n·Σx^2)，1 表示完全公平
+    values = list(values)
+    total = sum(values)
+    squares = sum(x * x for x in values)
+    return total * total / (len(values) * squares) if squares else 1.0
+
+class FlowMonitor:
+    # 挂在瓶颈 Router 上，按发送方统计排队时延和丢包
+    def __init__(self):
+        self.flows = {}  # sender -> [出队包数, 排队时延总和, 丢包数]
+
+    def _stats(self, sender):
+        stats = self.flows.get(sender)
+        if stats is None:
+            stats = self.flows[sender] = [0, 0.0, 0]
+        return stats
+
+    def on_dequeue(self, item, sojourn):
+        stats = self._stats(item[1])
+        stats[0] += 1
+        stats[1] += sojourn
+
+    def on_drop(self, item):
+        self._stats(item[1])[2] += 1
+
+class Sink(TCPConnection):
+    # 只回 ACK 的接收端，交付的字节数即累积 ACK
+    def handle(self, data):
+        pass
+
+class Flow:
+    def __init__(self, name, algorithm, sender, receiver, start, size):
+        self.name = name
+        self.algorithm = algorithm
+        self.sender = sender
+        self.receiver = receiver
+        self.start = start
+        self.size = size
+
+class Scenario:
+    # 多条流共享一个瓶颈链路：数据走 bottleneck，ACK 走不拥塞的反向链路
+    def __init__(self, bandwidth=1.25e6, delay=0.01, buffer_size=100, queue=None, mss=1000, trace=None, ack_every=1, gro=False):
+        self.bandwidth = bandwidth  # 瓶颈带宽（字节/秒）
+        self.delay = delay  # 单向传播时延
+        self.mss = mss
+        # 接收端的确认策略：ack_every=2 为延迟确认，gro 合并同一批到达的段
+        self.ack_every = ack_every
+        self.gro = gro
+        self.monitor = FlowMonitor()
+        # trace 为文件路径时，把所有包事件写进内存映射的 trace 文件
+        self.tracer = TraceWriter(trace) if trace is not None else None
+        self.bottleneck = Router(max_buffer_size=buffer_size, queue=queue, bandwidth=bandwidth, delay=delay, monitor=self.monitor, tracer=self.tracer, name='bottleneck')
+        self.reverse = Router(send_interval=0, max_buffer_size=10 ** 9, delay=delay, tracer=self.tracer, name='reverse')
+        self.payload = memoryview(b'X' * mss)  # 所有数据段共用的载荷
+        self.flows = []
+        self.duration = None
+
+    def add_flow(self, algorithm='reno', rtt=0.05, start=0.0, size=None, loss_rate=0.0, jitter=0.0, name=None,
+                 ignore_random_loss=None, **kwargs):
+        # rtt 为不含排队的往返时延，扣除链路传播时延后平分给两端的接入时延；
+        # ignore_random_loss 为 True 时路径诊断为随机丢包的丢包只重传不减窗，None 沿用算法的默认值
+        cls = ALGORITHMS[algorithm] if isinstance(algorithm, str) else algorithm
+        name = name or f"{getattr(cls, '__name__', algorithm)}-{len(self.flows)}"
+        access = max(rtt - 2 * self.delay, 0) / 2
+        sender = cls(name, self.bottleneck, rtt=access, max_packets=10 ** 12, jitter=jitter, loss_rate=loss_rate, **kwargs)
+        if ignore_random_loss is not None:
+            sender.cc.ignore_random_loss = ignore_random_loss
+        receiver = self._sink(name + '-sink', self.reverse, access, jitter)
+        sender.tracer = receiver.tracer = self.tracer
+        flow = Flow(name, algorithm, sender, receiver, start, size)
+        self.flows.append(flow)
+        return flow
+
+    def _sink(self, name, router, delay, jitter):
+        receiver = Sink(name, router, rtt=delay, max_packets=10 ** 12, jitter=jitter, loss_rate=0.0)
+        # 相当于握手已完成，接收端从序号 0 开始累积确认
+        receiver.rcv_started = True
+        receiver.ack_every = self.ack_every
+        receiver.gro = self.gro
+        return receiver
+
+    def _packets(self, flow):
+        # 按需生成数据段，载荷是同一块内存的视图
+        seqs = itertools.count(0, self.mss) if flow.size is None else range(0, flow.size, self.mss)
+        for seq in seqs:
+            yield TCPPacket.segment(self.payload, 0, self.mss, seq=seq)
+
+    def _start(self, flow):
+        dispatch(flow.sender.send_stream(self._packets(flow), flow.receiver))
+
+    async def _main(self, duration):
+        loop = asyncio.get_running_loop()
+        for flow in self.flows:
+            loop.call_later(flow.start, self._start, flow)
+        await asyncio.sleep(duration)
+
+    def run(self, duration=10.0, virtual_time=True):
+        self.duration = duration
+        run(self._main(duration), virtual_time=virtual_time)
+        if self.tracer is not None:
+            self.tracer.close()
+        return self.results()
+
+    def fork(self, warmup, duration, variants, workers=None):
+        # 先运行到 warmup，再为每个变体 fork 一个子进程：子进程继承此刻的全部状态（连接、队列、
+        # 时间轮上的定时器和随机数流），在新建的事件循环上（见 frame.transplant）按变体修改后
+        # 从 warmup 接着运行到 duration，返回与 variants 一一对应的 results()。
+        # 包级引擎的状态里有生成器（send_stream 的数据源）和绑定在事件循环上的回调，不能序列化成
+        # 检查点文件，所以只能靠 os.fork 的写时复制，没有 fork 的平台（Windows）不支持
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("Scenario.fork needs os.fork (POSIX)")
+        if self.tracer is not None:
+            raise ValueError("Cannot fork a scenario that writes a trace file")
+        workers = workers or os.cpu_count() or 1
+        results = [None] * len(variants)
+        with asyncio.Runner(loop_factory=VirtualTimeEventLoop) as runner:
+            runner.run(self._main(warmup))
+            pending = list(enumerate(variants))
+            running = []  # (变体序号, pid, 读端)
+            while pending or running:
+                while pending and len(running) < workers:
+                    i, variant = pending.pop(0)
+                    running.append((i, *self._fork_variant(runner, variant, duration - warmup, duration)))
+                i, pid, fd = running.pop(0)
+                with os.fdopen(fd, 'rb') as f:
+                    data = f.read()
+                os.waitpid(pid, 0)
+                status, value = pickle.loads(data) if data else ('error', 'variant process exited without a result')
+                if status == 'error':
+                    raise RuntimeError(f"Variant {i} failed:\n{value}")
+                results[i] = value
+        return results
+
+    def _fork_variant(self, runner, variant, remaining, duration):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(w)
+            return pid, r
+        os.close(r)
+        try:
+            loop = transplant(runner.get_loop())
+            self.apply(variant)
+            loop.run_until_complete(asyncio.sleep(remaining))
+            self.duration = duration
+            payload = ('ok', self.results())
+        except BaseException:
+            payload = ('error', traceback.format_exc())
+        with os.fdopen(w, 'wb') as f:
+            pickle.dump(payload, f)
+        os._exit(0)
+
+    def apply(self, variant):
+        # 修改运行中的场景。variant 为 fn(scenario)，或者字典：
+        #   loss_rate / jitter: 所有发送端；buffer_size: 瓶颈缓存；
+        #   algorithm: 所有发送端换成另一种拥塞控制算法，从当前窗口接着运行
+        if callable(variant):
+            variant(self)
+            return
+        for name, value in variant.items():
+            if name == 'buffer_size':
+                self._set_buffer(value)
+            elif name == 'algorithm':
+                cls = ALGORITHMS_CC[value] if isinstance(value, str) else value
+                for flow in self.flows:
+                    sender = flow.sender
+                    kwargs = {'initial_rtt': sender.rto.srtt or 2 * sender.rtt, 'name': sender.name} if issubclass(cls, BBR) else {}
+                    sender.cc = switch(sender.cc, cls, **kwargs)
+            elif name in ('loss_rate', 'jitter'):
+                for flow in self.flows:
+                    setattr(flow.sender, name, value)
+            else:
+                raise ValueError(f"Unknown variant parameter: {name}")
+
+    def _set_buffer(self, size):
+        self.bottleneck.buffer.max_size = self.bottleneck.max_buffer_size = size
+
+    def results(self):
+        flows = []
+        for flow in self.flows:
+            dequeued, sojourn, drops = self.monitor.flows.get(flow.sender, (0, 0.0, 0))
+            elapsed = max(self.duration - flow.start, 1e-9)
+            flows.append({
+                'name': flow.name,
+                'algorithm': flow.algorithm if isinstance(flow.algorithm, str) else flow.algorithm.__name__,
+                'goodput': flow.receiver.ack / elapsed,
+                'delivered': flow.receiver.ack,
+                'retransmissions': flow.sender.retransmissions,
+                'drops': drops,
+                'loss_rate': drops / (dequeued + drops) if dequeued + drops else 0.0,
+                'queueing_delay': sojourn / dequeued if dequeued else 0.0,
+                'srtt': flow.sender.rto.srtt,
+            })
+        goodputs = [f['goodput'] for f in flows]
+        return {
+            'flows': flows,
+            'jain_index': jain_index(goodputs) if flows else 1.0,
+            'utilization': sum(goodputs) / self.bandwidth,
+            'queue': self.bottleneck.buffer.stats(),
+        }
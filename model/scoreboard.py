@@ -0,0 +1,116 @@
+from bisect import bisect_left, insort
+
+class Segment:
+    __slots__ = ('packet', 'peer', 'seq', 'end', 'sent_at', 'retransmitted', 'sacked', 'delivered', 'delivered_at')
+
+    def __init__(self, packet, peer, sent_at):
+        self.packet = packet
+        self.peer = peer
+        self.seq = packet.seq
+        self.end = packet.seq + (packet.length or 1)  # SYN/FIN 占一个序号
+        self.sent_at = sent_at
+        self.retransmitted = False
+        self.sacked = False
+        self.delivered = 0  # 发送时记分板的累计交付数，用于估计交付速率
+        self.delivered_at = sent_at
+
+class Scoreboard:
+    # 发送端记分板：按序号有序保存已发送未确认的报文段。
+    # 累积确认从头部裁剪（均摊 O(1)），SACK 按二分查找定位，内存只随在途报文段数增长
+    def __init__(self):
+        self._seqs = []  # 有序序号，_head 之前的已被确认
+        self._head = 0
+        self._segments = {}  # seq -> Segment
+        self.snd_una = 0  # 收到的最大累积 ACK
+        self.snd_max = 0  # 已发送的最高序号（不含）
+        self.sacked = 0
+        self.delivered = 0  # 累计交付（累积确认或 SACK）的报文段数
+        self.delivered_at = None  # 最近一次交付的时间
+
+    def __len__(self):
+        return len(self._segments)
+
+    def __contains__(self, seq):
+        return seq in self._segments
+
+    def __iter__(self):
+        for i in range(self._head, len(self._seqs)):
+            yield self._segments[self._seqs[i]]
+
+    @property
+    def in_flight(self):
+        # 在途报文段数（不含已被 SACK 的）
+        return len(self._segments) - self.sacked
+
+    def get(self, seq):
+        return self._segments.get(seq)
+
+    def add(self, packet, peer, sent_at):
+        seq = packet.seq
+        segment = self._segments.get(seq)
+        if segment is not None:
+            return segment
+        segment = self._segments[seq] = Segment(packet, peer, sent_at)
+        self.stamp(segment)
+        if segment.end > self.snd_max:
+            self.snd_max = segment.end
+        if self._head == len(self._seqs) or seq > self._seqs[-1]:
+            self._seqs.append(seq)
+        else:
+            insort(self._seqs, seq, lo=self._head)
+        return segment
+
+    def stamp(self, segment):
+        # 记录发送（或重传）时的交付状态
+        if self.delivered_at is None:
+            self.delivered_at = segment.sent_at
+        segment.delivered = self.delivered
+        segment.delivered_at = self.delivered_at
+
+    def first(self):
+        if not self._segments:
+            return None
+        return self._segments[self._seqs[self._head]]
+
+    def ack(self, ack, now=None):
+        # 累积确认：移除所有 end <= ack 的报文段，返回被移除的报文段
+        acked = []
+        if ack <= self.snd_una:
+            return acked
+        self.snd_una = ack
+        seqs = self._seqs
+        while self._head < len(seqs):
+            segment = self._segments[seqs[self._head]]
+            if segment.end > ack:
+                break
+            del self._segments[segment.seq]
+            if segment.sacked:
+                self.sacked -= 1
+            else:
+                self.delivered += 1
+            acked.append(segment)
+            self._head += 1
+        if self._head > 64 and self._head * 2 > len(seqs):
+            del seqs[:self._head]
+            self._head = 0
+        if acked and now is not None:
+            self.delivered_at = now
+        return acked
+
+    def sack(self, blocks, now=None):
+        # 标记完全落在 SACK 块 [start, end) 内的报文段，返回新被标记的报文段
+        newly = []
+        seqs = self._seqs
+        for start, end in blocks:
+            i = bisect_left(seqs, start, self._head)
+            while i < len(seqs) and seqs[i] < end:
+                segment = self._segments[seqs[i]]
+                if not segment.sacked and segment.end <= end:
+                    segment.sacked = True
+                    self.sacked += 1
+                    newly.append(segment)
+                i += 1
+        self.delivered += len(newly)
+        if newly and now is not None:
+            self.delivered_at = now
+        return newly
@@ -0,0 +1,116 @@
+import math
+import heapq
+import asyncio
+import weakref
+
+TICK = 0.0001  # 默认 tick（秒）
+
+class TimerWheel:
+    # 分桶定时器：到期时间按 tick 取整后放进同一个桶，事件循环上只挂一个
+    # 最早非空桶的回调。增删定时器 O(1)（新桶 O(log 桶数)），空闲时不占用 CPU
+    # 为 True 时同一个桶内按精确到期时间执行；同一时刻的普通事件按加入顺序在前，
+    # schedule_ranked 加入的事件按 rank 排在后面（见 parallel.py）
+    ordered = False
+
+    def __init__(self, loop=None, tick=TICK):
+        self.loop = loop or asyncio.get_running_loop()
+        self.tick = tick
+        self.buckets = {}  # tick 序号 -> [entry, ...]
+        self.ticks = []  # 非空桶的 tick 序号（最小堆）
+        self.pending = 0
+        self.fired = 0  # 已执行的回调数
+        self._handle = None
+        self._armed_tick = None
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, delay, callback, *args):
+        return self.schedule_at(self.loop.time() + delay, callback, *args)
+
+    def schedule_at(self, when, callback, *args):
+        tick = math.ceil(when / self.tick)
+        entry = [tick, callback, args, when]
+        bucket = self.buckets.get(tick)
+        if bucket is None:
+            self.buckets[tick] = [entry]
+            heapq.heappush(self.ticks, tick)
+            if self._armed_tick is None or tick < self._armed_tick:
+                self._arm(tick)
+        else:
+            bucket.append(entry)
+        self.pending += 1
+        return entry
+
+    def schedule_ranked(self, when, rank, callback, *args):
+        entry = self.schedule_at(when, callback, *args)
+        entry.append(rank)
+        return entry
+
+    def cancel(self, entry):
+        # 惰性删除：只清掉回调，桶到期时跳过
+        if entry[1] is not None:
+            entry[1] = None
+            entry[2] = ()
+            self.pending -= 1
+
+    def move_to(self, loop):
+        # 换到另一个事件循环上继续（fork 出的子进程新建的循环），定时器原样保留
+        if self._handle is not None:
+            self._handle.cancel()
+        _wheels.pop(self.loop, None)
+        _wheels[loop] = self
+        self.loop = loop
+        self._handle = None
+        self._armed_tick = None
+        if self.ticks:
+            self._arm(self.ticks[0])
+
+    def _arm(self, tick):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._armed_tick = tick
+        self._handle = self.loop.call_at(tick * self.tick, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._armed_tick = None
+        tick = heapq.heappop(self.ticks)
+        bucket = self.buckets.pop(tick)
+        if self.ordered:
+            bucket.sort(key=_order)
+        try:
+            for entry in bucket:
+                callback = entry[1]
+                if callback is not None:
+                    entry[1] = None
+                    self.pending -= 1
+                    self.fired += 1
+                    callback(*entry[2])
+        except BaseException:
+            # 回调抛出异常：桶里还没执行的定时器放回原来的 tick（排在回调新加的之前），不会丢失
+            rest = [entry for entry in bucket if entry[1] is not None]
+            if rest:
+                added = self.buckets.get(tick)
+                if added is None:
+                    heapq.heappush(self.ticks, tick)
+                self.buckets[tick] = rest + (added or [])
+            raise
+        finally:
+            # 回调里新建的桶可能已挂上了非最早的 tick，这里统一改挂最早的桶
+            if self.ticks and self._armed_tick != self.ticks[0]:
+                self._arm(self.ticks[0])
+
+def _order(entry):
+    # [when] 或 [when, rank]：时刻相同时较短的普通事件排在前面
+    return entry[3:]
+
+_wheels = weakref.WeakKeyDictionary()
+
+def get_wheel(loop=None):
+    # 每个事件循环共用一个时间轮
+    loop = loop or asyncio.get_running_loop()
+    wheel = _wheels.get(loop)
+    if wheel is None:
+        wheel = _wheels[loop] = TimerWheel(loop)
+    return wheel
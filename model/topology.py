@@ -0,0 +1,244 @@
+import heapq
+import asyncio
+from frame import Router, HEADER_SIZE, dispatch, get_wheel, now
+from scenario import Scenario, FlowMonitor, Flow, ALGORITHMS, jain_index
+
+class LinkMonitor(FlowMonitor):
+    # 在 FlowMonitor 的基础上统计链路发出的字节数，用于算利用率
+    def __init__(self):
+        super().__init__()
+        self.bytes = 0
+
+    def on_dequeue(self, item, sojourn):
+        super().on_dequeue(item, sojourn)
+        self.bytes += item[0].length + HEADER_SIZE
+
+class Link:
+    # 单向链路：一个带宽/时延/队列固定的 Router，发完交给对端节点继续转发
+    def __init__(self, src, dst, bandwidth, delay, buffer_size=100, queue=None):
+        self.src = src
+        self.dst = dst
+        self.bandwidth = bandwidth  # 字节/秒
+        self.delay = delay  # 传播时延
+        self.monitor = LinkMonitor()
+        # queue 为返回队列对象的工厂（如 lambda: REDQueue(200)），每条链路各自一份
+        self.router = Router(max_buffer_size=buffer_size, queue=queue() if queue is not None else None,
+                             bandwidth=bandwidth, delay=delay, monitor=self.monitor, next_hop=dst, name=self.name)
+
+    @property
+    def name(self):
+        return f"{self.src.name}->{self.dst.name}"
+
+class Node:
+    # 转发节点。table 为 目的节点 -> 出链路 Router 的转发表，每跳查表 O(1)；
+    # 连接到本节点的主机把它当作 router 使用
+    def __init__(self, name, topology):
+        self.name = name
+        self.topology = topology
+        self.links = {}  # 邻居节点 -> Link
+        self.table = {}
+
+    def __repr__(self):
+        return f"Node({self.name!r})"
+
+    async def forward(self, packet, sender, receiver):
+        self.enqueue(packet, sender, receiver)
+
+    def enqueue(self, packet, sender, receiver):
+        dst = self.topology.hosts[receiver]
+        if dst is self:
+            dispatch(receiver.receive(packet, sender))
+        else:
+            self.table[dst].enqueue(packet, sender, receiver)
+
+class Topology:
+    def __init__(self):
+        self.nodes = {}  # 名字 -> Node
+        self.links = []
+        self.hosts = {}  # 连接 -> 所在节点
+
+    def add_node(self, name):
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node: {name}")
+        node = self.nodes[name] = Node(name, self)
+        return node
+
+    def node(self, name):
+        return name if isinstance(name, Node) else self.nodes[name]
+
+    def add_link(self, a, b, bandwidth, delay, buffer_size=100, queue=None, bidirectional=True):
+        # 默认建立双向链路（两个方向各自一个队列），返回 a->b 方向的 Link
+        a, b = self.node(a), self.node(b)
+        link = Link(a, b, bandwidth, delay, buffer_size, queue)
+        a.links[b] = link
+        self.links.append(link)
+        if bidirectional:
+            back = Link(b, a, bandwidth, delay, buffer_size, queue)
+            b.links[a] = back
+            self.links.append(back)
+        return link
+
+    def attach(self, conn, node):
+        # 把主机（连接）接到节点上，之后它发出的包都交给这个节点转发
+        node = self.node(node)
+        conn.router = node
+        self.hosts[conn] = node
+        return node
+
+    def compute_routes(self):
+        # 每个节点跑一次 Dijkstra（按传播时延，相同时取跳数少的），
+        # 只记下到每个目的节点的第一跳，转发时直接查表
+        for source in self.nodes.values():
+            source.table = {}
+            dist = {source: (0.0, 0)}
+            first = {}
+            heap = [(0.0, 0, 0, source)]
+            order = 1  # 堆里的并列次序，保证结果确定且不比较 Node
+            while heap:
+                d, hops, _, node = heapq.heappop(heap)
+                if dist[node] < (d, hops):
+                    continue
+                for neighbor, link in node.links.items():
+                    cost = (d + link.delay, hops + 1)
+                    if neighbor not in dist or cost < dist[neighbor]:
+                        dist[neighbor] = cost
+                        first[neighbor] = link if node is source else first[node]
+                        heapq.heappush(heap, (cost[0], cost[1], order, neighbor))
+                        order += 1
+            for dst, link in first.items():
+                source.table[dst] = link.router
+
+    def path(self, src, dst):
+        # 按转发表走出的节点序列
+        node, dst = self.node(src), self.node(dst)
+        nodes = [node]
+        while node is not dst:
+            router = node.table.get(dst)
+            if router is None:
+                raise ValueError(f"No route from {src} to {dst}")
+            node = router.next_hop
+            nodes.append(node)
+        return nodes
+
+    def path_delay(self, src, dst):
+        nodes = self.path(src, dst)
+        return sum(a.links[b].delay for a, b in zip(nodes, nodes[1:]))
+
+def dumbbell(pairs, bandwidth=1.25e6, delay=0.01, buffer_size=100, access_bandwidth=None, access_delay=0.005,
+             access_buffer=1000, queue=None):
+    # left_i -- left == right -- right_i，中间一条瓶颈链路；access_bandwidth 默认为瓶颈的 10 倍
+    topology = Topology()
+    topology.add_node('left')
+    topology.add_node('right')
+    topology.add_link('left', 'right', bandwidth, delay, buffer_size, queue)
+    access_bandwidth = access_bandwidth or 10 * bandwidth
+    for i in range(pairs):
+        for side in ('left', 'right'):
+            topology.add_node(f"{side}{i}")
+            topology.add_link(f"{side}{i}", side, access_bandwidth, access_delay, access_buffer)
+    topology.compute_routes()
+    return topology
+
+def parking_lot(hops, bandwidth=1.25e6, delay=0.01, buffer_size=100, queue=None):
+    # r0 == r1 == ... == r{hops}，每一跳都是瓶颈：长流走全程，交叉流各走一跳
+    topology = Topology()
+    for i in range(hops + 1):
+        topology.add_node(f"r{i}")
+    for i in range(hops):
+        topology.add_link(f"r{i}", f"r{i + 1}", bandwidth, delay, buffer_size, queue)
+    topology.compute_routes()
+    return topology
+
+def _ranked(schedule_ranked, index, deliver):
+    def outbox(when, packet, sender, receiver):
+        schedule_ranked(when, index, deliver, packet, sender, receiver)
+    return outbox
+
+def stop_time(duration, tick):
+    # 停在两个 tick 之间：duration 所在 tick 之前的都已执行，这个 tick 一个都没执行
+    return (round(duration / tick) - 0.5) * tick
+
+class TopologyScenario(Scenario):
+    # 与 Scenario 相同的流和运行方式，但数据和 ACK 都按拓扑的转发表逐跳转发
+    def __init__(self, topology, mss=1000, ack_every=1, gro=False):
+        self.topology = topology
+        self.mss = mss
+        self.ack_every = ack_every
+        self.gro = gro
+        self.tracer = None
+        self.payload = memoryview(b'X' * mss)
+        self.flows = []
+        self.duration = None
+
+    def add_flow(self, algorithm='reno', src=None, dst=None, start=0.0, size=None, access_delay=0.0, loss_rate=0.0,
+                 jitter=0.0, name=None, ignore_random_loss=None, **kwargs):
+        # access_delay: 主机到所接节点的单向时延；ignore_random_loss 同 Scenario.add_flow
+        cls = ALGORITHMS[algorithm] if isinstance(algorithm, str) else algorithm
+        name = name or f"{getattr(cls, '__name__', algorithm)}-{len(self.flows)}"
+        src, dst = self.topology.node(src), self.topology.node(dst)
+        sender = cls(name, src, rtt=access_delay, max_packets=10 ** 12, jitter=jitter, loss_rate=loss_rate, **kwargs)
+        if ignore_random_loss is not None:
+            sender.cc.ignore_random_loss = ignore_random_loss
+        receiver = self._sink(name + '-sink', dst, access_delay, jitter)
+        self.topology.attach(sender, src)
+        self.topology.attach(receiver, dst)
+        flow = Flow(name, algorithm, sender, receiver, start, size)
+        flow.src, flow.dst = src, dst
+        self.flows.append(flow)
+        return flow
+
+    def run(self, duration=10.0, virtual_time=True):
+        self.topology.compute_routes()
+        return super().run(duration, virtual_time)
+
+    def _rank_links(self, wheel):
+        # 确定的事件次序，与分区方式无关（parallel.py 的分区运行用的也是它）：同一 tick 内按精确时间执行，
+        # 同一时刻到达的包按链路编号投递，而不是按哪条链路先安排
+        wheel.ordered = True
+        for index, link in enumerate(self.topology.links):
+            router = link.router
+            router.outbox = _ranked(wheel.schedule_ranked, index, router._deliver_packet)
+
+    async def _main(self, duration):
+        wheel = get_wheel()
+        self._rank_links(wheel)
+        for flow in self.flows:
+            wheel.schedule_at(flow.start, self._start, flow)
+        await asyncio.sleep(stop_time(duration, wheel.tick) - now())
+
+    def _set_buffer(self, size):
+        # 变体的 buffer_size 作用于所有链路
+        for link in self.topology.links:
+            link.router.buffer.max_size = link.router.max_buffer_size = size
+
+    def results(self):
+        flows = []
+        for flow in self.flows:
+            elapsed = max(self.duration - flow.start, 1e-9)
+            drops = sum(link.monitor.flows.get(flow.sender, (0, 0.0, 0))[2] for link in self.topology.links)
+            path = self.topology.path(flow.src, flow.dst)
+            flows.append({
+                'name': flow.name,
+                'algorithm': flow.algorithm if isinstance(flow.algorithm, str) else flow.algorithm.__name__,
+                'path': [node.name for node in path],
+                'goodput': flow.receiver.ack / elapsed,
+                'delivered': flow.receiver.ack,
+                'retransmissions': flow.sender.retransmissions,
+                'drops': drops,
+                'srtt': flow.sender.rto.srtt,
+            })
+        links = {}
+        for link in self.topology.links:
+            if not link.monitor.bytes:
+                continue
+            stats = link.router.buffer.stats()
+            links[link.name] = {
+                'utilization': link.monitor.bytes / (link.bandwidth * self.duration),
+                'dropped': stats['dropped'],
+                'mean_sojourn': stats['mean_sojourn'],
+            }
+        return {
+            'flows': flows,
+            'jain_index': jain_index(f['goodput'] for f in flows) if flows else 1.0,
+            'links': links,
+        }
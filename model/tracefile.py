@@ -0,0 +1,138 @@
+import os
+import json
+import mmap
+import struct
+import numpy as np
+
+# 事件类型
+SEND, RETRANSMIT, ENQUEUE, DROP, DELIVER = range(5)
+EVENTS = ('send', 'retransmit', 'enqueue', 'drop', 'deliver')
+
+MAGIC = b'TCPTRC01'
+HEADER = struct.Struct('<8sQ')  # 魔数, 记录数
+RECORD = struct.Struct('<dIBBIQQ')  # 时间, 流编号, 事件, 标志位, 载荷长度, seq, ack
+# 与 RECORD 逐字节对应的 NumPy 结构体（不对齐）
+DTYPE = np.dtype([('time', '<f8'), ('flow', '<u4'), ('event', 'u1'), ('flags', 'u1'),
+                  ('size', '<u4'), ('seq', '<u8'), ('ack', '<u8')])
+
+class TraceWriter:
+    # 定长记录直接写进内存映射文件，写满时扩容为两倍；流名写在旁边的 .flows.json
+    def __init__(self, path, capacity=1 << 16):
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+        self.flows = []  # 流编号 -> 名字
+        self._ids = {}  # 连接对象 -> 流编号
+        self._file = open(path, 'w+b')
+        self._file.truncate(HEADER.size + capacity * RECORD.size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def flow_id(self, conn):
+        fid = self._ids.get(conn)
+        if fid is None:
+            fid = self._ids[conn] = len(self.flows)
+            self.flows.append(getattr(conn, 'name', str(fid)))
+        return fid
+
+    def record(self, event, time, conn, packet):
+        if self.count == self.capacity:
+            self._grow()
+        fid = self._ids.get(conn)
+        if fid is None:
+            fid = self.flow_id(conn)
+        RECORD.pack_into(self._mm, HEADER.size + self.count * RECORD.size,
+                         time, fid, event, packet.flags, packet.length, packet.seq, packet.ack)
+        self.count += 1
+
+    def _grow(self):
+        self._mm.close()
+        self.capacity *= 2
+        self._file.truncate(HEADER.size + self.capacity * RECORD.size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def flush(self):
+        HEADER.pack_into(self._mm, 0, MAGIC, self.count)
+        self._mm.flush()
+        with open(self.path + '.flows.json', 'w') as f:
+            json.dump(self.flows, f)
+
+    def close(self):
+        if self._mm.closed:
+            return
+        self.flush()
+        self._mm.close()
+        # 截掉未用完的预留空间
+        self._file.truncate(HEADER.size + self.count * RECORD.size)
+        self._file.close()
+
+class TraceReader:
+    # 以只读内存映射打开 trace，records 是结构化数组，可直接用 NumPy 分析
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+        if count:
+            self.records = np.memmap(path, dtype=DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=DTYPE)
+        flows = path + '.flows.json'
+        self.flows = []
+        if os.path.exists(flows):
+            with open(flows) as f:
+                self.flows = json.load(f)
+
+    def __len__(self):
+        return len(self.records)
+
+    def flow_id(self, flow):
+        return self.flows.index(flow) if isinstance(flow, str) else flow
+
+    def select(self, event=None, flow=None):
+        # 按事件类型（名字或编号）和流筛选
+        mask = np.ones(len(self.records), dtype=bool)
+        if event is not None:
+            mask &= self.records['event'] == (EVENTS.index(event) if isinstance(event, str) else event)
+        if flow is not None:
+            mask &= self.records['flow'] == self.flow_id(flow)
+        return self.records[mask]
+
+    def counts(self):
+        # {流名: {事件名: 次数}}
+        table = np.zeros((max(len(self.flows), 1), len(EVENTS)), dtype=np.int64)
+        np.add.at(table, (self.records['flow'].astype(np.intp), self.records['event'].astype(np.intp)), 1)
+        return {name: dict(zip(EVENTS, map(int, table[i]))) for i, name in enumerate(self.flows)}
+
+    def goodput(self, flow, interval=0.1):
+        # 按 interval 分箱的交付速率（字节/秒），返回 (箱起点, 速率)
+        delivered = self.select(DELIVER, flow)
+        if not len(delivered):
+            return np.empty(0), np.empty(0)
+        bins = np.arange(0, delivered['time'].max() + interval, interval)
+        sizes, _ = np.histogram(delivered['time'], bins=bins, weights=delivered['size'])
+        return bins[:-1], sizes / interval
+
+    def one_way_delay(self, flow):
+        # 数据段从首次发送到被交付的时间，返回 (交付时间, 时延)
+        sent = self.select(SEND, flow)
+        sent = sent[sent['size'] > 0]
+        delivered = self.select(DELIVER, flow)
+        delivered = delivered[delivered['size'] > 0]
+        seqs, first = np.unique(sent['seq'], return_index=True)
+        i = np.searchsorted(seqs, delivered['seq'])
+        i[i == len(seqs)] = 0
+        found = seqs[i] == delivered['seq'] if len(seqs) else np.zeros(len(delivered), dtype=bool)
+        times = delivered['time'][found]
+        return times, times - sent['time'][first[i[found]]]
+
+    def replay(self, event=None, flow=None):
+        # 按时间顺序逐条回放：(时间, 流名, 事件名, seq, ack, flags, size)
+        for r in self.select(event, flow):
+            yield (float(r['time']), self.flows[r['flow']] if r['flow'] < len(self.flows) else int(r['flow']),
+                   EVENTS[r['event']], int(r['seq']), int(r['ack']), int(r['flags']), int(r['size']))
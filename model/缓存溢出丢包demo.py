@@ -1,5 +1,5 @@
 import asyncio
-from frame import TCPConnection, Router, TCPPacket
+from frame import TCPConnection, Router, TCPPacket, run
 
 async def main():
     # 初始化路由器
@@ -37,4 +37,4 @@ async def main():
 
 # 运行演示
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
@@ -1,5 +1,5 @@
 import asyncio
-from frame import TCPConnection, Router, TCPPacket, TCPConnectionWithTimeout
+from frame import TCPConnection, Router, TCPPacket, TCPConnectionWithTimeout, run
 
 """尽管有超时重传，但是返回的ack丢了就很尴尬。不具有滑动发包"""
 
@@ -22,9 +22,12 @@ async def main():
     await asyncio.sleep(0.1)
     
     # 客户端均匀发送数据
+    # 序号按字节计算，ACK 为累积确认
+    seq = 2
     for i in range(50):
         data = f'Hello, Server! Message {i+1}'
-        data_packet = TCPPacket(seq=2 + i, ack=1, data=data)
+        data_packet = TCPPacket(seq=seq, ack=1, data=data)
+        seq += len(data)
         await client.send(data_packet, server)
         await asyncio.sleep(0.01)  # 均匀间隔发送
     
@@ -32,7 +35,7 @@ async def main():
     await asyncio.sleep(100)
     
     # 客户端发送FIN包断开连接
-    fin = TCPPacket(seq=7, ack=1, fin=True)
+    fin = TCPPacket(seq=seq, ack=1, fin=True)
     await client.send(fin, server)
     
     # 等待断开
@@ -40,4 +43,4 @@ async def main():
 
 # 运行演示
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
@@ -1,22 +1,7 @@
 import time
-import random
-
-class TCPPacket:
-    def __init__(self, seq=0, ack=0, syn=False, ack_flag=False, fin=False, data=''):
-        self.seq = seq
-        self.ack = ack
-        self.syn = syn
-        self.ack_flag = ack_flag
-        self.fin = fin
-        self.data = data
-
-    def __str__(self):
-        flags = []
-        if self.syn: flags.append('SYN')
-        if self.ack_flag: flags.append('ACK')
-        if self.fin: flags.append('FIN')
-        flag_str = '|'.join(flags) if flags else 'NONE'
-        return f"SEQ={self.seq}, ACK={self.ack}, FLAGS={flag_str}, DATA={self.data}"
+import rng
+from packet import TCPPacket
+from metrics import MetricsRecorder, RateMeter
 
 class TCPConnection:
     def __init__(self, name, rtt=0.15, max_packets=10000, jitter=0.001, loss_rate=0.001):
@@ -29,17 +14,57 @@ class TCPConnection:
         self.sent_packets = 0
         self.jitter = jitter
         self.loss_rate = loss_rate
+        self.rng = rng.unique('conn/' + str(name))  # this connection's loss/jitter stream
 
     def send(self, packet, peer):
         if self.sent_packets >= self.max_packets:
             return
-        if random.random() < self.loss_rate:
+        if self.loss_rate and self.rng.random() < self.loss_rate:
             # print(f"{self.name}: Packet lost;")
             return
         # print(f"{self.name} sending;")
         self.sent_packets += 1
         peer.receive(packet, self)
 
+    def send_window(self, count, size, peer):
+        # Aggregate equivalent of calling send() for `count` back-to-back data
+        # segments of `size` bytes: same seq/ack/sent_packets outcome in distribution,
+        # but the cost is independent of the window size.
+        delivered, last = self._sample_window(count, self.max_packets - self.sent_packets)
+        if delivered:
+            self.sent_packets += delivered
+            peer.receive_window(self.seq + (last + 1) * size, delivered, self)
+        self.seq += count * size
+        return delivered
+
+    def receive_window(self, ack, count, peer):
+        # Bulk counterpart of _handle_data: only the last delivered segment sets ack,
+        # and each of the `count` segments is answered with one ACK.
+        self.ack = ack
+        if self.loss_rate < 1:
+            acks = self.rng.generator.binomial(count, 1 - self.loss_rate)
+            self.sent_packets = min(self.sent_packets + acks, self.max_packets)
+
+    def _sample_window(self, count, room):
+        # Returns (segments delivered, index of the last delivered one or -1).
+        # Segments stop counting once `room` of them got through.
+        q = 1 - self.loss_rate
+        if count <= 0 or room <= 0 or q <= 0:
+            return 0, -1
+        if room <= count:
+            # Position of the segment that fills the remaining room
+            fill = room - 1 + self.rng.generator.negative_binomial(room, q)
+            if fill < count:
+                return room, fill
+        while True:
+            # Losses at the tail of the window, then successes before the last delivered one
+            trailing = self.rng.generator.geometric(q) - 1
+            if trailing >= count:
+                return 0, -1
+            delivered = 1 + self.rng.generator.binomial(count - 1 - trailing, q)
+            if delivered < room:
+                return delivered, count - 1 - trailing
+
     def receive(self, packet, peer):
         # print(f"{self.name} received;")
         # Basic TCP state machine
@@ -49,7 +74,7 @@ class TCPConnection:
             self._handle_synack(packet)
         elif packet.fin:
             self._handle_fin(packet, peer)
-        elif packet.data:
+        elif packet.length:
             self._handle_data(packet, peer)
 
     def _handle_syn(self, packet, peer):
@@ -69,6 +94,102 @@ class TCPConnection:
         self.send(fin_ack, peer)
 
     def _handle_data(self, packet, peer):
-        self.ack = packet.seq + len(packet.data)
+        self.ack = packet.seq + packet.length
         ack_packet = TCPPacket(seq=self.seq, ack=self.ack, ack_flag=True)
-        self.send(ack_packet, peer)
\ No newline at end of file
+        self.send(ack_packet, peer)
+
+class TCPCCConnection(TCPConnection):
+    # Per-RTT engine hosting a congestion controller from cc.py: each round sends one
+    # window, then reports the delivered packets to cc.on_ack and any loss to cc.on_loss.
+    # With `bandwidth` (packets/s) set, the path also has a bottleneck whose drop-tail
+    # buffer holds `buffer_size` packets; otherwise losses come from loss_rate only.
+    # Per-round samples go to a MetricsRecorder (pass `metrics` to flush them to disk
+    # or decimate them); throughput is averaged over the last `throughput_window` seconds.
+    COLUMNS = ('time', 'cwnd', 'throughput', 'rtt')
+    TITLE = 'Congestion Window'
+
+    def __init__(self, name, cc, rtt=0.15, max_packets=10000, jitter=0.001, loss_rate=0.001, bandwidth=None, buffer_size=100,
+                 metrics=None, throughput_window=1.0):
+        super().__init__(name, rtt, max_packets, jitter, loss_rate)
+        self.cc = cc
+        self.bandwidth = bandwidth
+        self.buffer_size = buffer_size
+        self.queue = 0.0  # standing queue at the bottleneck (packets)
+        self.time = 0
+        self.bytes_sent = 0
+        self.metrics = metrics if metrics is not None else MetricsRecorder(self.COLUMNS)
+        self.losses = MetricsRecorder(('time',))  # never decimated
+        self.rate = RateMeter(throughput_window)
+
+    @property
+    def cwnd(self):
+        return self.cc.cwnd
+
+    @property
+    def times(self):
+        return self.metrics['time']
+
+    @property
+    def cwnds(self):
+        return self.metrics['cwnd']
+
+    @property
+    def throughput(self):
+        return self.metrics['throughput']
+
+    @property
+    def rtts(self):
+        return self.metrics['rtt']
+
+    @property
+    def loss_events(self):
+        return self.losses['time']
+
+    def plot_metrics(self, **kwargs):
+        # Drawing lives in report.py, which imports matplotlib only when called
+        from report import plot_metrics
+        return plot_metrics(self.times, self.cwnds, self.throughput, self.loss_events, title=self.TITLE, **kwargs)
+
+    def _round_time(self):
+        if self.bandwidth is None:
+            return self.rtt
+        return self.rtt + self.queue / self.bandwidth
+
+    def _window(self):
+        # One round sends a window, or a min-RTT's worth at the pacing rate if lower
+        window = self.cc.cwnd
+        if self.cc.pacing_rate is not None:
+            window = min(window, self.cc.pacing_rate * self._round_time())
+        return max(int(window), 1)
+
+    def _transmit(self, count, size, peer):
+        # Whatever exceeds the pipe sits in the buffer; beyond that it is dropped
+        dropped = 0
+        if self.bandwidth is not None:
+            excess = max(count - self.bandwidth * self.rtt, 0)
+            self.queue = min(excess, self.buffer_size)
+            dropped = int(excess - self.queue)
+        delivered = self.send_window(count - dropped, size, peer)
+        return delivered, self._round_time() + self.rng.uniform(-self.jitter, self.jitter)
+
+    def send_data(self, data, peer, until=None):
+        # With `until`, stops after the first round ending at or past that time; calling
+        # again carries on from there (see snapshot.py for warm-started runs)
+        while self.sent_packets < self.max_packets and (until is None or self.time < until):
+            packets_to_send = self._window()
+            bytes_this_round = packets_to_send * len(data)
+            delivered, rtt = self._transmit(packets_to_send, len(data), peer)
+
+            self.time += rtt
+            self.bytes_sent += bytes_this_round
+            current_throughput = self.rate.add(self.time, bytes_this_round)
+
+            # Record metrics
+            self.metrics.record(self.time, self.cc.cwnd, current_throughput, rtt)
+
+            self.cc.on_ack(delivered, self.time, rtt, packets_to_send, delivered / rtt)
+            if delivered < packets_to_send:
+                self.losses.record(self.time)
+                self.cc.on_loss(self.time)
+        self.metrics.flush()
+        self.losses.flush()
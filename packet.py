@@ -0,0 +1,119 @@
+SYN = 1
+ACK = 2
+FIN = 4
+CE = 8     # congestion experienced, set by an ECN-marking queue
+ECE = 16   # receiver echoes CE back to the sender
+
+class TCPPacket:
+    # Fixed-size header shared by network.py and model/frame.py. Payloads are not
+    # copied: a packet keeps a reference to its buffer plus offset/length, so
+    # segments cut from a SendBuffer all point into the same memory.
+    __slots__ = ('seq', 'ack', 'flags', 'length', 'sack', '_buf', '_off')
+
+    def __init__(self, seq=0, ack=0, syn=False, ack_flag=False, fin=False, data=''):
+        self.seq = seq
+        self.ack = ack
+        self.flags = (SYN if syn else 0) | (ACK if ack_flag else 0) | (FIN if fin else 0)
+        self._buf = data
+        self._off = 0
+        self.length = len(data)
+        self.sack = None  # SACK blocks ((start, end), ...)
+
+    @classmethod
+    def segment(cls, buf, offset, length, seq=0, ack=0):
+        # Data segment viewing buf[offset:offset + length] without slicing it
+        packet = cls.__new__(cls)
+        packet.seq = seq
+        packet.ack = ack
+        packet.flags = 0
+        packet.sack = None
+        packet._buf = buf
+        packet._off = offset
+        packet.length = length
+        return packet
+
+    @property
+    def data(self):
+        buf = self._buf
+        if self._off or self.length != len(buf):
+            return buf[self._off:self._off + self.length]
+        return buf
+
+    @data.setter
+    def data(self, data):
+        self._buf = data
+        self._off = 0
+        self.length = len(data)
+
+    @property
+    def syn(self):
+        return bool(self.flags & SYN)
+
+    @syn.setter
+    def syn(self, value):
+        self.flags = self.flags | SYN if value else self.flags & ~SYN
+
+    @property
+    def ack_flag(self):
+        return bool(self.flags & ACK)
+
+    @ack_flag.setter
+    def ack_flag(self, value):
+        self.flags = self.flags | ACK if value else self.flags & ~ACK
+
+    @property
+    def fin(self):
+        return bool(self.flags & FIN)
+
+    @fin.setter
+    def fin(self, value):
+        self.flags = self.flags | FIN if value else self.flags & ~FIN
+
+    @property
+    def ce(self):
+        return bool(self.flags & CE)
+
+    @ce.setter
+    def ce(self, value):
+        self.flags = self.flags | CE if value else self.flags & ~CE
+
+    @property
+    def ece(self):
+        return bool(self.flags & ECE)
+
+    @ece.setter
+    def ece(self, value):
+        self.flags = self.flags | ECE if value else self.flags & ~ECE
+
+    def __str__(self):
+        flags = []
+        if self.syn: flags.append('SYN')
+        if self.ack_flag: flags.append('ACK')
+        if self.fin: flags.append('FIN')
+        if self.ce: flags.append('CE')
+        if self.ece: flags.append('ECE')
+        flag_str = '|'.join(flags) if flags else 'NONE'
+        return f"SEQ={self.seq}, ACK={self.ack}, FLAGS={flag_str}, DATA={payload_text(self.data)}"
+
+class SendBuffer:
+    # One contiguous send buffer; packets cut from it are zero-copy views
+    def __init__(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.view = memoryview(data)
+
+    def __len__(self):
+        return len(self.view)
+
+    def packet(self, offset, size, seq=None):
+        size = min(size, len(self.view) - offset)
+        return TCPPacket.segment(self.view, offset, size, seq=offset if seq is None else seq)
+
+    def packets(self, mss, start_seq=0):
+        for offset in range(0, len(self.view), mss):
+            yield self.packet(offset, mss, seq=start_seq + offset)
+
+def payload_text(data):
+    if isinstance(data, str):
+        return data
+    return bytes(data).decode(errors='replace')
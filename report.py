@@ -0,0 +1,115 @@
+import numpy as np
+
+# Plotting for both engines. matplotlib is imported only when something is drawn, so
+# the simulators and sweep workers never pay for it. Long series are downsampled to
+# about `max_points` before drawing and loss markers go into one LineCollection.
+MAX_POINTS = 2000
+
+def _pyplot():
+    import matplotlib.pyplot as plt
+    return plt
+
+def minmax(x, y, n):
+    # Keeps the min and max sample of each of n//2 equal-count buckets, plus the first
+    # and last sample of the series: fully vectorised, preserves spikes and dips
+    x, y = np.asarray(x), np.asarray(y)
+    buckets = max(n // 2, 1)
+    if len(y) <= n:
+        return x, y
+    size = len(y) // buckets
+    end = size * buckets
+    blocks = y[:end].reshape(buckets, size)
+    base = np.arange(buckets) * size
+    lo = base + blocks.argmin(axis=1)
+    hi = base + blocks.argmax(axis=1)
+    idx = np.unique(np.concatenate((lo, hi, [0, len(y) - 1])))
+    return x[idx], y[idx]
+
+def lttb(x, y, n):
+    # Largest-Triangle-Three-Buckets (Steinarsson 2013): keeps the first and last
+    # sample and, per bucket, the one spanning the largest triangle with the point
+    # kept before it and the mean of the next bucket. One NumPy pass per bucket.
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    size = len(y)
+    if n >= size or n < 3:
+        return x, y
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    idx = np.empty(n, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < n - 1 else size
+        cx = x[nxt_lo:nxt_hi].mean()
+        cy = y[nxt_lo:nxt_hi].mean()
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': minmax}
+
+def downsample(x, y, max_points=MAX_POINTS, method='lttb'):
+    if max_points is None or len(y) <= max_points:
+        return np.asarray(x), np.asarray(y)
+    return DOWNSAMPLERS[method](x, y, max_points)
+
+def loss_markers(ax, times, max_markers=MAX_POINTS, **kwargs):
+    # All losses as one vlines collection spanning the axes height; losses closer
+    # together than the plot can show are merged first
+    times = np.asarray(times, dtype=float)
+    if not len(times):
+        return None
+    if len(times) > max_markers:
+        span = times.max() - times.min() or 1.0
+        times = np.unique(np.round((times - times.min()) / span * max_markers)) / max_markers * span + times.min()
+    style = {'color': 'red', 'alpha': 0.3, 'linestyle': '--'}
+    style.update(kwargs)
+    return ax.vlines(times, 0, 1, transform=ax.get_xaxis_transform(), **style)
+
+def plot_metrics(times, cwnds, throughput, loss_events=(), title='Congestion Window', max_points=MAX_POINTS,
+                 method='lttb', show=True):
+    # cwnd and throughput over time with loss markers; returns the figure
+    plt = _pyplot()
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
+
+    ax1.plot(*downsample(times, cwnds, max_points, method))
+    ax1.set_xlabel('Time (s)')
+    ax1.set_ylabel('Congestion Window (packets)')
+    ax1.set_title(title)
+
+    ax2.plot(*downsample(times, throughput, max_points, method))
+    ax2.set_xlabel('Time (s)')
+    ax2.set_ylabel('Throughput (bytes/s)')
+    ax2.set_title('Network Throughput')
+
+    if len(loss_events):
+        loss_markers(ax1, loss_events, max_points, label='Packet Loss')
+        loss_markers(ax2, loss_events, max_points)
+        ax1.legend()
+
+    fig.tight_layout()
+    if show:
+        plt.show()
+    return fig
+
+def plot_series(y, x=None, title=None, xlabel=None, ylabel=None, max_points=MAX_POINTS, method='lttb', show=True,
+                **style):
+    # One downsampled series, e.g. a packet-level connection's cwnd_history
+    plt = _pyplot()
+    y = np.asarray(y)
+    x = np.arange(len(y)) if x is None else x
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(*downsample(x, y, max_points, method), **style)
+    if title:
+        ax.set_title(title)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    if ylabel:
+        ax.set_ylabel(ylabel)
+    ax.grid(True)
+    if show:
+        plt.show()
+    return fig
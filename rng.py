@@ -0,0 +1,113 @@
+import hashlib
+import itertools
+import numpy as np
+
+class RandomStream:
+    # One component's random numbers: a numpy Generator plus uniform draws served from
+    # pre-generated blocks. random() is the C-level __next__ of an iterator over the
+    # blocks, so a per-packet draw stays close to random.random() and far below a
+    # scalar numpy call.
+    def __init__(self, generator, block=4096):
+        self.generator = generator
+        self.block = block
+        self._before = None  # generator state the current block was drawn from
+        self.random = itertools.chain.from_iterable(self._blocks()).__next__
+
+    def _blocks(self, first=None):
+        if first is not None:
+            yield first
+        while True:
+            self._before = self.generator.bit_generator.state
+            # Iterating a memoryview yields Python floats without a tolist() copy
+            yield memoryview(self.generator.random(self.block))
+
+    def __getstate__(self):
+        # The block iterator cannot be pickled: store the state the current block was
+        # drawn from, how much of it is used up, and the generator's state now (direct
+        # generator draws may have moved it on since). Finding out how much is used up
+        # takes the rest of the block, so this stream is rebuilt the same way after.
+        before, state = self._before, self.generator.bit_generator.state
+        used = 0
+        if before is not None:
+            left = 0
+            while True:
+                self.random()
+                if self._before is not before:
+                    break
+                left += 1
+            used = self.block - left
+        self._restore(before, state, used)
+        return {'generator': self.generator, 'block': self.block, 'before': before, 'state': state, 'used': used}
+
+    def __setstate__(self, d):
+        self.generator = d['generator']
+        self.block = d['block']
+        self._restore(d['before'], d['state'], d['used'])
+
+    def _restore(self, before, state, used):
+        bit_generator = self.generator.bit_generator
+        first = None
+        if before is not None:
+            bit_generator.state = before
+            first = memoryview(self.generator.random(self.block))[used:]
+        bit_generator.state = state
+        self._before = before
+        self.random = itertools.chain.from_iterable(self._blocks(first)).__next__
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+class RNG:
+    # Hands out independent streams derived from one root seed. A stream depends only
+    # on the root seed and its name, not on which other streams exist or when they were
+    # created. unique() adds a per-name creation counter to the name, so components
+    # should pass their own stable identity (a connection or link name) rather than a
+    # shared one: then adding a component leaves every other component's stream alone.
+    def __init__(self, seed=None, block=4096):
+        self.root = np.random.SeedSequence(seed)
+        self.seed = self.root.entropy
+        self.block = block
+        self.streams = {}
+        self._counts = {}
+
+    def stream(self, name):
+        # The same name always returns the same stream
+        stream = self.streams.get(name)
+        if stream is None:
+            words = np.frombuffer(hashlib.sha256(name.encode()).digest()[:16], dtype=np.uint32)
+            seq = np.random.SeedSequence(self.seed, spawn_key=tuple(int(w) for w in words))
+            stream = self.streams[name] = RandomStream(np.random.Generator(np.random.PCG64(seq)), self.block)
+        return stream
+
+    def unique(self, name):
+        # A fresh stream for each call: name#0, name#1, ... in creation order. Only
+        # components sharing a name depend on each other's creation order
+        n = self._counts.get(name, 0)
+        self._counts[name] = n + 1
+        return self.stream(f"{name}#{n}")
+
+_default = RNG()
+
+def seed(value=None, block=4096):
+    # Replaces the process-wide RNG; components created afterwards draw from the new one
+    global _default
+    _default = RNG(value, block)
+    return _default
+
+def get_rng():
+    return _default
+
+def set_rng(value):
+    # Installs an RNG restored from a snapshot, streams and name counters included
+    global _default
+    _default = value
+    return _default
+
+def stream(name):
+    return _default.stream(name)
+
+def unique(name):
+    return _default.unique(name)
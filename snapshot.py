@@ -0,0 +1,160 @@
+import os
+import zlib
+import pickle
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import rng
+from cc import ALGORITHMS, BBR, switch
+from metrics import MetricsRecorder, RateMeter
+from network import TCPConnection, TCPCCConnection, TCPPacket
+
+# Checkpoints of the per-RTT engine. A snapshot is the zlib-compressed pickle of the
+# connections plus the process-wide rng service (every stream's exact position and the
+# name counters), so a restored run draws the same numbers the original would have.
+# Warm up once, snapshot, then fork variants that only pay for the part after the
+# warm-up.
+# Only the per-RTT engine (network.py) can be serialized. The packet-level engine in
+# model/ cannot: its state includes the generators feeding send_stream and callbacks
+# bound to a running event loop, so it has no snapshot file, no save() and no load().
+# model/scenario.Scenario.fork warm-starts its variants by forking the process instead
+# (POSIX only).
+FORMAT = 1
+MAGIC = b'TCPSNAP'
+
+def dumps(*objects, level=6):
+    blob = pickle.dumps((FORMAT, rng.get_rng(), objects), protocol=pickle.HIGHEST_PROTOCOL)
+    return MAGIC + zlib.compress(blob, level)
+
+def loads(blob, install_rng=True):
+    # Returns the objects passed to dumps(); the snapshot's rng service replaces the
+    # current one unless install_rng is False
+    if not blob.startswith(MAGIC):
+        raise ValueError("Not a simulation snapshot")
+    version, service, objects = pickle.loads(zlib.decompress(blob[len(MAGIC):]))
+    if version != FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {version}")
+    if install_rng:
+        rng.set_rng(service)
+    return objects
+
+def save(path, blob):
+    with open(path, 'wb') as f:
+        f.write(blob)
+
+def load(path):
+    # Returns the snapshot bytes, ready for loads() or fork()
+    with open(path, 'rb') as f:
+        return f.read()
+
+def warm_up(conn, peer, data, until):
+    # Runs conn until virtual time `until` and returns the snapshot to fork from
+    conn.send_data(data, peer, until=until)
+    return dumps(conn, peer, data)
+
+def fork(blob, algorithm=None, history=False, metrics_path=None, **changes):
+    # Restores (conn, peer, data) and applies a variant: any connection attribute
+    # (loss_rate, buffer_size, bandwidth, jitter, rtt, max_packets, ...) and optionally
+    # another congestion-control algorithm continuing from the current window.
+    # Without history the metrics start empty, so they describe the variant only; the new
+    # recorder keeps the snapshot recorder's format and decimation. A recorder that wrote
+    # to disk gets its own directory: metrics_path, by default "<original path>-fork".
+    # Installs the snapshot's rng service, as loads() does.
+    conn, peer, data = loads(blob)
+    for name, value in changes.items():
+        if not hasattr(conn, name):
+            raise ValueError(f"Unknown connection parameter: {name}")
+        setattr(conn, name, value)
+    if algorithm is not None:
+        cls = ALGORITHMS[algorithm] if isinstance(algorithm, str) else algorithm
+        # Same initial RTT as bbr.TCPBBRConnection
+        conn.cc = switch(conn.cc, cls, **({'initial_rtt': conn.rtt, 'name': conn.name} if issubclass(cls, BBR) else {}))
+    if not history:
+        old = conn.metrics
+        if metrics_path is None and old.path is not None:
+            metrics_path = old.path.rstrip(os.sep) + '-fork'
+        conn.metrics = old.fresh(metrics_path)
+        conn.losses = MetricsRecorder(('time',))
+        conn.rate = RateMeter(conn.rate.window, start=conn.time)
+    return conn, peer, data
+
+def run_variant(blob, variant, until=None, metrics_path=None):
+    # Forks one variant, runs it until `until` (or max_packets) and summarises the part
+    # after the snapshot. The caller's rng service is put back afterwards, so running
+    # variants in this process has no side effects
+    saved = rng.get_rng()
+    try:
+        conn, peer, data = fork(blob, metrics_path=metrics_path, **variant)
+        start, start_bytes, start_packets = conn.time, conn.bytes_sent, conn.sent_packets
+        conn.send_data(data, peer, until=until)
+    finally:
+        rng.set_rng(saved)
+    elapsed = (conn.time - start) or 1e-9
+    cwnds, rtts = conn.cwnds, conn.rtts
+    return {
+        **variant,
+        'start': start,
+        'time': conn.time,
+        'rounds': conn.metrics.seen,
+        'throughput': (conn.bytes_sent - start_bytes) / elapsed,
+        'goodput': (conn.sent_packets - start_packets) * len(data) / elapsed,
+        'loss_events': len(conn.losses),
+        'mean_cwnd': float(cwnds.mean()) if len(cwnds) else 0.0,
+        'mean_rtt': float(rtts.mean()) if len(rtts) else 0.0,
+    }
+
+def _run_variant(args):
+    return run_variant(*args)
+
+def run_variants(blob, variants, until=None, workers=None, metrics_dir=None):
+    # The snapshot is a few KB of bytes, cheap to hand to every worker. If the snapshot's
+    # recorder writes to disk, variant i writes to metrics_dir/variant<i> (by default
+    # metrics_dir is "<original path>-variants")
+    workers = workers or os.cpu_count() or 1
+    if metrics_dir is None:
+        path = loads(blob, install_rng=False)[0].metrics.path
+        metrics_dir = path.rstrip(os.sep) + '-variants' if path is not None else None
+    paths = [os.path.join(metrics_dir, f"variant{i}") if metrics_dir else None for i in range(len(variants))]
+    jobs = [(blob, variant, until, path) for variant, path in zip(variants, paths)]
+    if workers == 1 or len(jobs) == 1:
+        return [_run_variant(job) for job in jobs]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_run_variant, jobs))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Warm a per-RTT flow up once, then fork what-if variants from it.')
+    parser.add_argument('--algorithm', choices=sorted(ALGORITHMS), default='reno')
+    parser.add_argument('--rtt', type=float, default=0.15)
+    parser.add_argument('--loss', type=float, default=0.001)
+    parser.add_argument('--bandwidth', type=float, default=None, help='bottleneck packets/s')
+    parser.add_argument('--buffer', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warmup', type=float, default=30.0, help='virtual seconds before the snapshot')
+    parser.add_argument('--duration', type=float, default=30.0, help='virtual seconds each variant runs after it')
+    parser.add_argument('--vary-loss', nargs='*', type=float, default=[])
+    parser.add_argument('--vary-buffer', nargs='*', type=int, default=[])
+    parser.add_argument('--switch', nargs='*', choices=sorted(ALGORITHMS), default=[])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--save', default=None, help='also write the snapshot to this file')
+    args = parser.parse_args(argv)
+
+    rng.seed(args.seed)
+    conn = TCPCCConnection('client', ALGORITHMS[args.algorithm](), rtt=args.rtt, max_packets=10 ** 12,
+                           loss_rate=args.loss, bandwidth=args.bandwidth, buffer_size=args.buffer)
+    server = TCPConnection('server')
+    conn.send(TCPPacket(seq=0, syn=True), server)
+    blob = warm_up(conn, server, 'X' * 1000, args.warmup)
+    if args.save:
+        save(args.save, blob)
+    print(f"snapshot at t={conn.time:.2f}s: cwnd {conn.cwnd:.1f}, {len(blob)} bytes")
+
+    variants = [{}]
+    variants += [{'loss_rate': loss} for loss in args.vary_loss]
+    variants += [{'buffer_size': size} for size in args.vary_buffer]
+    variants += [{'algorithm': name} for name in args.switch]
+    for result in run_variants(blob, variants, until=conn.time + args.duration, workers=args.workers):
+        label = ', '.join(f"{k}={result[k]}" for k in ('loss_rate', 'buffer_size', 'algorithm') if k in result)
+        print(f"{label or 'baseline':<24} goodput {result['goodput']:>12.0f} B/s  mean cwnd {result['mean_cwnd']:7.1f}  "
+              f"losses {result['loss_events']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import os
+import sys
+import csv
+import json
+import hashlib
+import argparse
+import itertools
+import rng
+from concurrent.futures import ProcessPoolExecutor
+from cc import ALGORITHMS, BBR
+from network import TCPConnection, TCPCCConnection
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.sweep_cache')
+
+# Defaults for everything a point does not set explicitly
+DEFAULTS = {
+    'engine': 'rtt',  # 'rtt': per-RTT TCPCCConnection, 'packet': model/scenario.Scenario
+    'algorithm': 'reno',
+    'rtt': 0.15,
+    'loss_rate': 0.001,
+    'buffer_size': 100,
+    'seed': 0,
+    'bandwidth': None,  # packets/s for 'rtt' (None: no bottleneck), bytes/s for 'packet'
+    'max_packets': 10000,  # 'rtt' only: packets to deliver before the run ends
+    'packet_size': 1000,
+    'jitter': 0.0,
+    'delay': 0.01,  # 'packet' only: one-way bottleneck propagation delay
+    'duration': 10.0,  # 'packet' only: virtual seconds to run
+    'flows': 1,  # 'packet' only: flows sharing the bottleneck
+    'pacing': False,  # 'packet' only: pace Reno/CUBIC at a multiple of cwnd/srtt
+}
+
+def grid(algorithm=('reno',), rtt=(0.15,), loss_rate=(0.001,), buffer_size=(100,), seed=(0,), **fixed):
+    # Cartesian product of the swept axes; `fixed` values are copied into every point
+    points = []
+    for values in itertools.product(algorithm, rtt, loss_rate, buffer_size, seed):
+        point = dict(fixed)
+        point.update(zip(('algorithm', 'rtt', 'loss_rate', 'buffer_size', 'seed'), values))
+        points.append(point)
+    return points
+
+def _normalize(point):
+    unknown = set(point) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    full = dict(DEFAULTS)
+    full.update(point)
+    return full
+
+_code_version = None
+
+def code_version():
+    # Hash of every simulator source file, so cached results are dropped when the code changes
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for directory in (ROOT, os.path.join(ROOT, 'model')):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.py'):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        digest.update(name.encode() + b'\0' + f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+def cache_key(point):
+    blob = json.dumps(_normalize(point), sort_keys=True) + code_version()
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class ResultCache:
+    # One JSON file per point under cache_dir/<key[:2]>/<key>.json
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent sweeps never see half a file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+
+def _run_rtt(p):
+    cls = ALGORITHMS[p['algorithm']]
+    # Same initial RTT as bbr.TCPBBRConnection
+    cc = cls(initial_rtt=p['rtt']) if issubclass(cls, BBR) else cls()
+    conn = TCPCCConnection('sweep', cc, rtt=p['rtt'], max_packets=p['max_packets'], jitter=p['jitter'],
+                           loss_rate=p['loss_rate'], bandwidth=p['bandwidth'], buffer_size=p['buffer_size'])
+    conn.send_data('X' * p['packet_size'], TCPConnection('sink'))
+    elapsed = conn.time or 1e-9
+    cwnds, rtts = conn.cwnds, conn.rtts
+    return {
+        'time': conn.time,
+        'rounds': conn.metrics.seen,
+        'throughput': conn.bytes_sent / elapsed,
+        'goodput': conn.sent_packets * p['packet_size'] / elapsed,
+        'loss_events': len(conn.losses),
+        'mean_cwnd': float(cwnds.mean()) if len(cwnds) else 0.0,
+        'mean_rtt': float(rtts.mean()) if len(rtts) else 0.0,
+    }
+
+def _run_packet(p):
+    model = os.path.join(ROOT, 'model')
+    if model not in sys.path:
+        sys.path.insert(0, model)
+    from scenario import Scenario
+    bandwidth = p['bandwidth'] if p['bandwidth'] is not None else 1.25e6
+    scenario = Scenario(bandwidth=bandwidth, delay=p['delay'], buffer_size=p['buffer_size'], mss=p['packet_size'])
+    for _ in range(p['flows']):
+        scenario.add_flow(p['algorithm'], rtt=p['rtt'], loss_rate=p['loss_rate'], jitter=p['jitter'], pacing=p['pacing'])
+    results = scenario.run(p['duration'])
+    flows = results['flows']
+    return {
+        'time': p['duration'],
+        'goodput': sum(f['goodput'] for f in flows),
+        'retransmissions': sum(f['retransmissions'] for f in flows),
+        'drops': sum(f['drops'] for f in flows),
+        'queueing_delay': results['queue']['mean_sojourn'],
+        'utilization': results['utilization'],
+        'jain_index': results['jain_index'],
+    }
+
+_ENGINES = {'rtt': _run_rtt, 'packet': _run_packet}
+
+def run_point(point):
+    # Runs one point in the current process. Every component draws from its own stream
+    # of an rng service seeded here, so a point gives the same result in any worker.
+    p = _normalize(point)
+    rng.seed(p['seed'])
+    return _ENGINES[p['engine']](p)
+
+def sweep(points, workers=None, cache_dir=CACHE_DIR, use_cache=True):
+    # Returns one dict per point (its parameters plus the run summary), in order.
+    # Cached points are read back; the rest are spread over a process pool.
+    cache = ResultCache(cache_dir) if use_cache else None
+    results = [None] * len(points)
+    todo = []
+    for i, point in enumerate(points):
+        key = cache_key(point)
+        summary = cache.get(key) if cache else None
+        if summary is None:
+            todo.append((i, key))
+        else:
+            results[i] = {**_normalize(point), **summary}
+
+    if todo:
+        workers = workers or os.cpu_count() or 1
+        pending = [points[i] for i, _ in todo]
+        if workers == 1 or len(pending) == 1:
+            summaries = map(run_point, pending)
+            _collect(summaries, todo, points, results, cache)
+        else:
+            chunksize = max(1, len(pending) // (workers * 4))
+            with ProcessPoolExecutor(workers) as pool:
+                _collect(pool.map(run_point, pending, chunksize=chunksize), todo, points, results, cache)
+    return results
+
+def _collect(summaries, todo, points, results, cache):
+    for (i, key), summary in zip(todo, summaries):
+        if cache:
+            cache.put(key, summary)
+        results[i] = {**_normalize(points[i]), **summary}
+
+def write_csv(results, out):
+    fields = list(DEFAULTS)
+    for result in results:
+        fields += [k for k in result if k not in fields]
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a parameter sweep over algorithm x RTT x loss x buffer x seed.')
+    parser.add_argument('--algorithm', nargs='+', default=['reno', 'cubic', 'bbr'])
+    parser.add_argument('--rtt', nargs='+', type=float, default=[0.15])
+    parser.add_argument('--loss', nargs='+', type=float, default=[0.001])
+    parser.add_argument('--buffer', nargs='+', type=int, default=[100])
+    parser.add_argument('--seeds', type=int, default=1, help='number of seeds per point')
+    parser.add_argument('--engine', choices=sorted(_ENGINES), default='rtt')
+    parser.add_argument('--bandwidth', type=float, default=None)
+    parser.add_argument('--max-packets', type=int, default=DEFAULTS['max_packets'])
+    parser.add_argument('--duration', type=float, default=DEFAULTS['duration'])
+    parser.add_argument('--pacing', action='store_true')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--out', default=None, help='CSV file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    points = grid(args.algorithm, args.rtt, args.loss, args.buffer, range(args.seeds),
+                  engine=args.engine, bandwidth=args.bandwidth, max_packets=args.max_packets, duration=args.duration,
+                  pacing=args.pacing)
+    results = sweep(points, workers=args.workers, use_cache=not args.no_cache)
+    if args.out:
+        with open(args.out, 'w', newline='') as f:
+            write_csv(results, f)
+    else:
+        write_csv(results, sys.stdout)
+
+if __name__ == "__main__":
+    main()